@@ -0,0 +1,324 @@
+import os
+import sys
+import json
+import time
+import html
+import platform
+import argparse
+import tempfile
+import threading
+import tracemalloc
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+import torch
+import snapshots
+import preprocess
+from champion_store import read_champions
+import lore_index
+import training
+import quantize
+from generation import GenerationService, build_tiny_tokenizer, build_tiny_gpt2, percentile
+from scraper import (ROLE_SELECTOR, RACE_SELECTOR, QUOTE_SELECTOR, SHORT_BIO_PARAGRAPH_SELECTOR,
+                     SHORT_BIO_CONTAINER_SELECTOR, RELATED_CHAMPION_SELECTOR, BIO_LINK_XPATH,
+                     CONTENT_CONTAINER_SELECTOR, CONTENT_PARAGRAPH_SELECTOR, STORY_LINK_XPATH, LIVE_BASE_URL)
+
+STAGES = {}
+# Metrics where bigger is better; every other compared metric is a latency
+THROUGHPUT_METRICS = ("items_per_second", "tokens_per_second")
+LATENCY_METRICS = ("p50_seconds", "p95_seconds", "p99_seconds")
+
+
+def stage(name):
+    """Register a benchmark stage: fn(ctx) -> {"latencies": [...], "items": n, "tokens": n (optional)}"""
+    def register(fn):
+        STAGES[name] = fn
+        return fn
+    return register
+
+def _rss_bytes():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) * 1024
+    return 0
+
+class PeakRSSSampler:
+    """Background thread sampling resident memory, recording the peak and the value it started from"""
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.peak = 0
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            self.peak = max(self.peak, _rss_bytes())
+            time.sleep(self.interval)
+
+    def __enter__(self):
+        self.start = self.peak = _rss_bytes()
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop_event.set()
+        self.thread.join()
+        self.peak = max(self.peak, _rss_bytes())
+
+
+class BenchmarkContext:
+    """Fixed, offline inputs shared by all stages"""
+    def __init__(self, parquet_path="../data/lol_champions_data.parquet", champions=40, seed=0):
+        torch.manual_seed(seed)
+        self.df = read_champions(parquet_path).head(champions).reset_index(drop=True)
+        self.texts = preprocess.build_text_to_embed(self.df).tolist()
+        self.tokenizer = build_tiny_tokenizer(self.texts[:20], vocab_size=1000)
+        self.token_lists = preprocess.tokenize_documents(self.tokenizer, self.texts)
+        self.pages = fixture_pages(self.df)
+
+
+def _text(value):
+    # missing parquet fields come back from pandas as NaN floats
+    return value if isinstance(value, str) else ""
+
+def _paragraphs(text):
+    return "".join(f'<p class="p_1_sJ">{html.escape(p)}</p>' for p in _text(text).split("\n\n") if p.strip())
+
+def fixture_pages(df, base_url=LIVE_BASE_URL):
+    """Synthetic rendered champion/bio/story pages built from the parquet, using the live site's markup"""
+    pages = []
+    for row in df.to_dict("records"):
+        slug = "".join(c for c in str(row.get("name", "")).lower() if c.isalnum())
+        related = row.get("related_champions")
+        related = related.split(", ") if isinstance(related, str) else list(related if related is not None else [])
+        related_html = "".join(f'<li class="champion_1xlO"><h5>{html.escape(r)}</h5></li>' for r in related)
+        e = {key: html.escape(_text(row.get(key))) for key in ("role", "race", "quote", "short_bio")}
+        pages.append(("details", f"{base_url}/en_US/champion/{slug}/", f"""<html><body>
+<div class="typeDescription_ixWu"><h6>{e['role']}</h6></div><div class="ChampionRace_a_Fp"><h6>{e['race']}</h6></div>
+<div class="quote_2507"><p>{e['quote']}</p></div><div class="biographyText_3-to"><p>{e['short_bio']}</p></div>
+<ul class="champions_jmhN">{related_html}</ul>
+<a href="/en_US/story/champion/{slug}/"><button><span>Read Biography</span></button></a></body></html>"""))
+        pages.append(("bio", f"{base_url}/en_US/story/champion/{slug}/",
+                      f'<html><body><div id="CatchElement">{_paragraphs(row.get("full_biography"))}</div>'
+                      f'<a href="/en_US/story/{slug}-color-story/">Story</a></body></html>'))
+        pages.append(("story", f"{base_url}/en_US/story/{slug}-color-story/",
+                      f'<html><body><div id="CatchElement">{_paragraphs(row.get("full_story"))}</div></body></html>'))
+    return pages
+
+
+@stage("scrape_parse")
+def bench_scrape_parse(ctx):
+    """Browser-free extraction of saved champion pages (the replay path of the scraper)"""
+    latencies = []
+    for kind, url, page_html in ctx.pages:
+        started = time.perf_counter()
+        doc = snapshots.parse_html(page_html, url)
+        if kind == "details":
+            snapshots.details_payload(doc, ROLE_SELECTOR, RACE_SELECTOR, QUOTE_SELECTOR, SHORT_BIO_PARAGRAPH_SELECTOR,
+                                      SHORT_BIO_CONTAINER_SELECTOR, RELATED_CHAMPION_SELECTOR, BIO_LINK_XPATH)
+        else:
+            snapshots.content_payload(doc, CONTENT_CONTAINER_SELECTOR, CONTENT_PARAGRAPH_SELECTOR,
+                                      STORY_LINK_XPATH if kind == "bio" else None)
+        latencies.append(time.perf_counter() - started)
+    return {"latencies": latencies, "items": len(latencies)}
+
+@stage("text_to_embed")
+def bench_text_to_embed(ctx, repeats=20):
+    latencies = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        preprocess.build_text_to_embed(ctx.df)
+        latencies.append(time.perf_counter() - started)
+    return {"latencies": latencies, "items": repeats * len(ctx.df)}
+
+@stage("tokenize")
+def bench_tokenize(ctx):
+    latencies = []
+    tokens = 0
+    for text in ctx.texts:
+        started = time.perf_counter()
+        tokens += len(preprocess.tokenize_documents(ctx.tokenizer, [text])[0])
+        latencies.append(time.perf_counter() - started)
+    return {"latencies": latencies, "items": len(latencies), "tokens": tokens}
+
+@stage("pack")
+def bench_pack(ctx, repeats=5, block_size=256):
+    latencies = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        columns = preprocess.pack_documents(ctx.token_lists, block_size, ctx.tokenizer.eos_token_id,
+                                            ctx.tokenizer.eos_token_id)
+        latencies.append(time.perf_counter() - started)
+    return {"latencies": latencies, "items": repeats, "tokens": repeats * sum(map(sum, columns["attention_mask"]))}
+
+@stage("train_step")
+def bench_train_step(ctx, steps=10, batch_size=4, block_size=128, mode="full", gradient_checkpointing=False):
+    """Forward/backward/optimizer step of a tiny GPT-2 on packed champion text"""
+    model = training.prepare_model(build_tiny_gpt2(ctx.tokenizer, n_positions=block_size), mode, gradient_checkpointing)
+    model.train()
+    optimizer = torch.optim.AdamW([p for p in model.parameters() if p.requires_grad], lr=5e-5)
+    columns = preprocess.pack_documents(ctx.token_lists, block_size, ctx.tokenizer.eos_token_id,
+                                        ctx.tokenizer.eos_token_id)
+    input_ids = torch.tensor(columns["input_ids"])
+    labels = torch.tensor(columns["labels"])
+    latencies = []
+    for step in range(steps):
+        rows = torch.arange(step * batch_size, (step + 1) * batch_size) % len(input_ids)
+        started = time.perf_counter()
+        loss = model(input_ids=input_ids[rows], labels=labels[rows]).loss
+        loss.backward()
+        optimizer.step()
+        optimizer.zero_grad()
+        latencies.append(time.perf_counter() - started)
+    return {"latencies": latencies, "items": steps, "tokens": steps * batch_size * block_size}
+
+@stage("train_step_lora")
+def bench_train_step_lora(ctx):
+    return bench_train_step(ctx, mode="lora")
+
+@stage("lore_index")
+def bench_lore_index(ctx, repeats=20):
+    """Lore index build time, then context lookups by champion name and by free text"""
+    with tempfile.TemporaryDirectory() as index_dir:
+        started = time.perf_counter()
+        index = lore_index.build_index(ctx.df, index_dir)
+        build_seconds = time.perf_counter() - started
+        queries = [f"{name.title()} prepares for battle" for name in index.champions[:10]]
+        queries += ["an ancient war between the ice tribes", "a thief in the city of progress"]
+        latencies = lore_index.benchmark_queries(index, queries, repeats)
+        chunks = len(index)
+    return {"latencies": latencies, "items": len(latencies), "build_seconds": round(build_seconds, 4),
+            "chunks": chunks}
+
+@stage("generate")
+def bench_generate(ctx, max_new_tokens=32):
+    service = GenerationService(model_path="tiny-gpt2", device="cpu", tokenizer=ctx.tokenizer,
+                                model=build_tiny_gpt2(ctx.tokenizer))
+    prompts = [text[:120] for text in ctx.texts[:8]]
+    latencies = []
+    for prompt in prompts:
+        started = time.perf_counter()
+        service.generate([prompt], max_length=None, max_new_tokens=max_new_tokens, min_new_tokens=max_new_tokens)
+        latencies.append(time.perf_counter() - started)
+    return {"latencies": latencies, "items": len(prompts), "tokens": len(prompts) * max_new_tokens}
+
+
+@stage("generate_int8")
+def bench_generate_int8(ctx, max_new_tokens=32):
+    """generate stage on the int8 dynamically quantized tiny GPT-2, plus its perplexity change vs fp32"""
+    fp32 = build_tiny_gpt2(ctx.tokenizer).eval()
+    int8 = quantize.quantize_model(build_tiny_gpt2(ctx.tokenizer))
+    service = GenerationService(model_path="tiny-gpt2-int8", device="cpu", tokenizer=ctx.tokenizer, model=int8)
+    prompts = [text[:120] for text in ctx.texts[:8]]
+    latencies = []
+    for prompt in prompts:
+        started = time.perf_counter()
+        service.generate([prompt], max_length=None, max_new_tokens=max_new_tokens, min_new_tokens=max_new_tokens)
+        latencies.append(time.perf_counter() - started)
+    sample = ctx.texts[-4:]
+    return {"latencies": latencies, "items": len(prompts), "tokens": len(prompts) * max_new_tokens,
+            "perplexity_fp32": round(quantize.perplexity(fp32, ctx.tokenizer, sample, 256), 3),
+            "perplexity_int8": round(quantize.perplexity(int8, ctx.tokenizer, sample, 256), 3)}
+
+
+def run_stage(name, ctx, trace_allocations=False):
+    if trace_allocations:
+        tracemalloc.start()
+    with PeakRSSSampler() as sampler:
+        started = time.perf_counter()
+        result = STAGES[name](ctx)
+        elapsed = time.perf_counter() - started
+    peak_alloc = None
+    if trace_allocations:
+        peak_alloc = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    latencies = result["latencies"]
+    metrics = {
+        "items": result["items"],
+        "seconds": round(elapsed, 4),
+        "items_per_second": round(result["items"] / elapsed, 3) if elapsed else 0.0,
+        "p50_seconds": round(percentile(latencies, 50), 6),
+        "p95_seconds": round(percentile(latencies, 95), 6),
+        "p99_seconds": round(percentile(latencies, 99), 6),
+        "peak_rss_mb": round(sampler.peak / 2**20, 1),
+        "rss_increase_mb": round((sampler.peak - sampler.start) / 2**20, 1),
+    }
+    if "tokens" in result:
+        metrics["tokens_per_second"] = round(result["tokens"] / elapsed, 1) if elapsed else 0.0
+    if peak_alloc is not None:
+        metrics["peak_python_alloc_mb"] = round(peak_alloc / 2**20, 2)
+    for key, value in result.items():
+        if key not in ("latencies", "items", "tokens"):
+            metrics[key] = value
+    return metrics
+
+def _run_stage_in_process(name, parquet_path, champions, threads, trace_allocations):
+    torch.set_num_threads(threads)
+    return run_stage(name, BenchmarkContext(parquet_path, champions), trace_allocations)
+
+def run_stage_isolated(name, parquet_path, champions, threads=1, trace_allocations=False):
+    """run_stage in a fresh spawned process, so a stage's RSS never includes memory held by the stages
+    run before it and results do not depend on --stages order (as in training.compare_modes_tiny)"""
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return pool.submit(_run_stage_in_process, name, parquet_path, champions, threads, trace_allocations).result()
+
+def compare(current, baseline, threshold=0.10):
+    """Regressions beyond `threshold` (relative) in latency or throughput, per stage"""
+    regressions = []
+    for name, metrics in current["stages"].items():
+        before = baseline.get("stages", {}).get(name)
+        if not before:
+            continue
+        for key in LATENCY_METRICS:
+            if before.get(key) and metrics.get(key, 0) > before[key] * (1 + threshold):
+                regressions.append(f"{name}.{key}: {before[key]} -> {metrics[key]}")
+        for key in THROUGHPUT_METRICS:
+            if before.get(key) and metrics.get(key, 0) < before[key] * (1 - threshold):
+                regressions.append(f"{name}.{key}: {before[key]} -> {metrics[key]}")
+    return regressions
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline, CPU-only benchmarks of every pipeline stage")
+    parser.add_argument("--parquet", default="../data/lol_champions_data.parquet")
+    parser.add_argument("--champions", type=int, default=40, help="number of champions used as fixed input")
+    parser.add_argument("--stages", nargs="*", default=None, help=f"subset of: {', '.join(STAGES)}")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", default=None, help="baseline results JSON to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.10, help="relative change counted as a regression")
+    parser.add_argument("--trace-allocations", action="store_true", help="also record peak Python allocations")
+    parser.add_argument("--threads", type=int, default=1, help="torch CPU threads, fixed for comparable runs")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "torch": torch.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "threads": args.threads,
+        "stages": {},
+    }
+    for name in args.stages or list(STAGES):
+        print(f"Running stage {name}...")
+        results["stages"][name] = run_stage_isolated(name, args.parquet, args.champions, args.threads,
+                                                     args.trace_allocations)
+        print(f"  {json.dumps(results['stages'][name])}")
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results saved to {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print(f"\nNo regressions beyond {args.threshold:.0%} against {args.compare}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+import os
+import json
+import argparse
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+DEFAULT_STORE_PATH = "../data/lol_champions_data.parquet"
+
+CHAMPION_SCHEMA = pa.schema([
+    ("name", pa.string()),
+    ("region", pa.string()),
+    ("role", pa.string()),
+    ("race", pa.string()),
+    ("quote", pa.string()),
+    ("related_champions", pa.list_(pa.string())),
+    ("short_bio", pa.string()),
+    ("full_biography", pa.string()),
+    ("full_story", pa.string()),
+    ("url", pa.string()),
+    ("bio_url", pa.string()),
+    ("story_url", pa.string()),
+])
+# Small metadata columns first; the multi-kilobyte lore text columns are only read when asked for
+METADATA_COLUMNS = ["name", "region", "role", "race", "quote", "related_champions", "url", "bio_url", "story_url"]
+EXPORT_FORMATS = ("csv", "json")
+
+
+def normalise_related(value):
+    """related_champions as a list, also for legacy files that stored a comma-joined string"""
+    if value is None or isinstance(value, float):
+        return []
+    if isinstance(value, str):
+        return [name.strip() for name in value.split(",") if name.strip()]
+    return [str(name) for name in value]
+
+def _column_values(records, field):
+    if field == "related_champions":
+        return [normalise_related(r.get(field)) for r in records]
+    return [None if r.get(field) is None else str(r.get(field)) for r in records]
+
+def write_champions(records, path=DEFAULT_STORE_PATH, row_group_size=64):
+    """Write scraped champion dicts as the canonical parquet store, replacing `path` atomically"""
+    table = pa.Table.from_arrays([pa.array(_column_values(records, field.name), type=field.type)
+                                  for field in CHAMPION_SCHEMA], schema=CHAMPION_SCHEMA)
+    tmp_path = f"{path}.tmp"
+    pq.write_table(table, tmp_path, row_group_size=row_group_size, compression="zstd")
+    os.replace(tmp_path, path)
+    print(f"Data saved to {path} ({table.num_rows} champions)")
+    return table
+
+def read_table(path=DEFAULT_STORE_PATH, columns=None):
+    """Memory-mapped read of only `columns`; unknown columns are ignored so older stores still load"""
+    if columns is not None:
+        available = pq.read_schema(path, memory_map=True).names
+        columns = [c for c in columns if c in available]
+    table = pq.read_table(path, columns=columns, memory_map=True)
+    if "related_champions" in table.column_names and not pa.types.is_list(table.schema.field("related_champions").type):
+        index = table.column_names.index("related_champions")
+        table = table.set_column(index, pa.field("related_champions", pa.list_(pa.string())),
+                                 pa.array([normalise_related(v) for v in table.column("related_champions").to_pylist()],
+                                          type=pa.list_(pa.string())))
+    return table
+
+def read_champions(path=DEFAULT_STORE_PATH, columns=None):
+    """Champion rows as a DataFrame with only `columns` read, related_champions always a list"""
+    df = read_table(path, columns).to_pandas()
+    if "related_champions" in df.columns:
+        df["related_champions"] = df["related_champions"].apply(normalise_related)
+    return df
+
+def export(path=DEFAULT_STORE_PATH, formats=EXPORT_FORMATS, prefix=None):
+    """On-demand CSV (related_champions comma-joined) and/or JSON exports of the store"""
+    prefix = prefix or os.path.splitext(path)[0]
+    df = read_champions(path)
+    written = []
+    for fmt in formats:
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"unknown export format {fmt!r}; expected one of {', '.join(EXPORT_FORMATS)}")
+        filename = f"{prefix}.{fmt}"
+        if fmt == "csv":
+            df.assign(related_champions=df["related_champions"].apply(", ".join)).to_csv(filename, index=False, encoding="utf-8")
+        else:
+            with open(filename, "w", encoding="utf-8") as f:
+                json.dump(df.to_dict("records"), f, ensure_ascii=False, indent=4)
+        print(f"Data saved to {filename}")
+        written.append(filename)
+    return written
+
+def parse_export_formats(value):
+    return [fmt.strip() for fmt in (value or "").split(",") if fmt.strip()]
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect or export the champion parquet store")
+    parser.add_argument("--store", default=DEFAULT_STORE_PATH)
+    parser.add_argument("--export", default=None, help="comma-separated export formats (csv,json)")
+    parser.add_argument("--columns", default=None, help="comma-separated columns to show")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.export:
+        export(args.store, parse_export_formats(args.export))
+        return
+    columns = args.columns.split(",") if args.columns else METADATA_COLUMNS
+    print(read_champions(args.store, columns).to_string())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,319 @@
+import os
+import json
+import time
+import random
+import asyncio
+import hashlib
+import argparse
+import threading
+import urllib.request
+import urllib.error
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import pandas as pd
+
+GEMINI_MODEL_NAME = "gemini-2.0-flash"
+METRICS = ["coherence", "relevance", "narrative_quality", "originality"]
+
+INSTRUCTION_TEMPLATE = (
+    "You are a story evaluator. For the given input prompt and its generated "
+    "story, rate each of the following on a scale of 1 (worst) to 5 (best) "
+    "and return ONLY a JSON object with keys:\n"
+    '  "coherence": …,         # logical flow\n'
+    '  "relevance": …,         # stays on topic\n'
+    '  "narrative_quality": …, # engaging & well‑written\n'
+    '  "originality": …        # novelty / creativity\n\n'
+    "Input Prompt:\n{prompt}\n\nGenerated Story:\n{story}"
+)
+
+
+class RateLimitError(Exception):
+    """The judge backend asked us to slow down (HTTP 429 / RESOURCE_EXHAUSTED)"""
+
+
+def _is_rate_limit(error):
+    text = f"{type(error).__name__} {error}"
+    return "429" in text or "RESOURCE_EXHAUSTED" in text or "rate limit" in text.lower()
+
+class GeminiJudge:
+    """Gemini through google-genai's async client, with the notebook's deterministic JSON config"""
+    def __init__(self, model_name=GEMINI_MODEL_NAME, api_key=None):
+        from google import genai
+        from google.genai import types
+        self.model_name = model_name
+        self.client = genai.Client(api_key=api_key or os.environ["GEMINI_API_KEY"])
+        self.config = types.GenerateContentConfig(
+            response_mime_type="application/json",
+            max_output_tokens=100,
+            temperature=0.0,
+        )
+
+    async def judge(self, instruction):
+        try:
+            resp = await self.client.aio.models.generate_content(
+                model=self.model_name,
+                contents=[instruction],
+                config=self.config,
+            )
+        except Exception as e:
+            if _is_rate_limit(e):
+                raise RateLimitError(str(e)) from e
+            raise
+        return json.loads(resp.text)
+
+class StubJudge:
+    """Deterministic offline judge: scores are derived from a hash of the instruction"""
+    def __init__(self, model_name="stub-judge"):
+        self.model_name = model_name
+
+    @staticmethod
+    def scores_for(instruction):
+        digest = hashlib.sha256(instruction.encode("utf-8")).digest()
+        return {metric: 1 + digest[i] % 5 for i, metric in enumerate(METRICS)}
+
+    async def judge(self, instruction):
+        return self.scores_for(instruction)
+
+class HttpJudge:
+    """Judge behind a local HTTP endpoint taking {"model", "instruction"} and returning the scores JSON"""
+    def __init__(self, url, model_name="stub-judge", timeout=30):
+        self.url = url
+        self.model_name = model_name
+        self.timeout = timeout
+
+    def _post(self, instruction):
+        body = json.dumps({"model": self.model_name, "instruction": instruction}).encode("utf-8")
+        request = urllib.request.Request(self.url, data=body, headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as resp:
+                return json.loads(resp.read())
+        except urllib.error.HTTPError as e:
+            if e.code == 429:
+                raise RateLimitError(f"HTTP 429 from {self.url}") from e
+            raise
+
+    async def judge(self, instruction):
+        return await asyncio.to_thread(self._post, instruction)
+
+
+class StubJudgeHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        with self.server.lock:
+            self.server.requests += 1
+            limited = self.server.rate_limit_every and self.server.requests % self.server.rate_limit_every == 0
+        if limited:
+            self.send_response(429)
+            self.end_headers()
+            return
+        time.sleep(self.server.latency)
+        body = json.dumps(StubJudge.scores_for(request["instruction"])).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_stub_judge_server(port=0, latency=0.05, rate_limit_every=0):
+    """Local deterministic judge for tests; every `rate_limit_every`-th request gets a 429.
+    Returns the server and the URL to give HttpJudge."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), StubJudgeHandler)
+    server.latency = latency
+    server.rate_limit_every = rate_limit_every
+    server.requests = 0
+    server.lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/judge"
+
+
+class EvaluationCache:
+    """Append-only JSON-lines store of judge scores keyed by hash(judge model, template, prompt, story)"""
+    def __init__(self, path="evaluation_cache.jsonl"):
+        self.path = path
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    self.entries[entry["key"]] = entry["scores"]
+
+    @staticmethod
+    def key(model_name, template, prompt, story):
+        return hashlib.sha256(json.dumps([model_name, template, prompt, story], ensure_ascii=False).encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    def put(self, key, scores):
+        self.entries[key] = scores
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"key": key, "scores": scores}, ensure_ascii=False) + "\n")
+
+
+class AdaptiveLimiter:
+    """Concurrency limit that halves and backs off on rate-limit errors and creeps back up on success"""
+    def __init__(self, max_concurrency=8, base_delay=1.0, max_delay=60.0, recover_after=10):
+        self.max_concurrency = max_concurrency
+        self.limit = max_concurrency
+        self.active = 0
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.delay = base_delay
+        self.recover_after = recover_after
+        self.successes = 0
+        self.resume_at = 0.0
+        self.rate_limited = 0
+        self.condition = asyncio.Condition()
+
+    async def acquire(self):
+        async with self.condition:
+            while self.active >= self.limit:
+                await self.condition.wait()
+            self.active += 1
+        wait = self.resume_at - time.monotonic()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    async def release(self, rate_limited=False):
+        async with self.condition:
+            self.active -= 1
+            if rate_limited:
+                self.rate_limited += 1
+                self.limit = max(1, self.limit // 2)
+                self.resume_at = max(self.resume_at, time.monotonic() + self.delay * (1 + random.random()))
+                self.delay = min(self.max_delay, self.delay * 2)
+                self.successes = 0
+            else:
+                self.successes += 1
+                self.delay = max(self.base_delay, self.delay / 2)
+                if self.successes >= self.recover_after and self.limit < self.max_concurrency:
+                    self.limit += 1
+                    self.successes = 0
+            self.condition.notify_all()
+
+
+class AsyncEvaluator:
+    """Scores stories with a bounded number of concurrent judge calls, reusing cached scores.
+
+    evaluation_detailed.csv gains a row as each story is scored and evaluation_summary.csv is
+    refreshed every `summary_every` results; both are rewritten in input order at the end."""
+    def __init__(self, judge, cache, max_concurrency=8, max_retries=5, template=INSTRUCTION_TEMPLATE,
+                 detailed_path="evaluation_detailed.csv", summary_path="evaluation_summary.csv", summary_every=10):
+        self.judge = judge
+        self.cache = cache
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.template = template
+        self.detailed_path = detailed_path
+        self.summary_path = summary_path
+        self.summary_every = summary_every
+        self.cache_hits = 0
+        self.judge_calls = 0
+        self.failures = 0
+
+    async def _score(self, limiter, instruction):
+        for attempt in range(1, self.max_retries + 1):
+            await limiter.acquire()
+            try:
+                self.judge_calls += 1
+                scores = await self.judge.judge(instruction)
+            except RateLimitError:
+                await limiter.release(rate_limited=True)
+                if attempt == self.max_retries:
+                    raise
+                continue
+            except Exception:
+                await limiter.release()
+                if attempt == self.max_retries:
+                    raise
+                await asyncio.sleep(2 ** attempt)
+                continue
+            await limiter.release()
+            return scores
+
+    async def _evaluate_row(self, limiter, index, row):
+        """Scores for one row; a row that still fails after all retries gets NaN scores and an error, uncached"""
+        key = EvaluationCache.key(self.judge.model_name, self.template, row["prompt"], row["story"])
+        scores = self.cache.get(key)
+        error = None
+        if scores is not None:
+            self.cache_hits += 1
+        else:
+            try:
+                scores = await self._score(limiter, self.template.format(prompt=row["prompt"], story=row["story"]))
+                if not isinstance(scores, dict):
+                    raise ValueError(f"judge returned {type(scores).__name__}, expected a JSON object")
+                self.cache.put(key, scores)
+            except Exception as e:
+                self.failures += 1
+                error = f"{type(e).__name__}: {e}"
+                scores = {}
+        return index, {"prompt": row["prompt"], "model": row["model"], "story": row["story"],
+                       **{metric: scores.get(metric, float("nan")) for metric in METRICS}, "error": error}
+
+    def _write_summary(self, records):
+        summary = (pd.DataFrame(records)
+                   .groupby("model", as_index=False)
+                   .mean(numeric_only=True)
+                   .round(2))
+        summary.to_csv(self.summary_path, index=False)
+        return summary
+
+    async def evaluate_frame(self, df):
+        """Score every (prompt, model, story) row of `df`; returns (detailed, summary) DataFrames"""
+        limiter = AdaptiveLimiter(self.max_concurrency)
+        columns = ["prompt", "model", "story"] + METRICS + ["error"]
+        pd.DataFrame(columns=columns).to_csv(self.detailed_path, index=False)
+        tasks = [asyncio.create_task(self._evaluate_row(limiter, i, row)) for i, row in enumerate(df.to_dict("records"))]
+        records = [None] * len(tasks)
+        done = 0
+        for next_result in asyncio.as_completed(tasks):
+            index, record = await next_result
+            records[index] = record
+            pd.DataFrame([record], columns=columns).to_csv(self.detailed_path, mode="a", header=False, index=False)
+            done += 1
+            if done % self.summary_every == 0:
+                self._write_summary([r for r in records if r is not None])
+        detailed = pd.DataFrame(records, columns=columns)
+        detailed.to_csv(self.detailed_path, index=False)
+        summary = self._write_summary(records)
+        print(f"Scored {len(records)} stories: {self.cache_hits} from cache, {self.judge_calls} judge calls, "
+              f"{limiter.rate_limited} rate-limited, {self.failures} failed")
+        return detailed, summary
+
+    def evaluate(self, df):
+        return asyncio.run(self.evaluate_frame(df))
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="LLM-judge evaluation of generated stories")
+    parser.add_argument("--stories", default="league_stories.csv", help="CSV with prompt, model, story columns")
+    parser.add_argument("--judge", choices=["gemini", "stub", "stub-server"], default="gemini")
+    parser.add_argument("--model-name", default=GEMINI_MODEL_NAME)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--cache", default="evaluation_cache.jsonl")
+    parser.add_argument("--detailed", default="evaluation_detailed.csv")
+    parser.add_argument("--summary", default="evaluation_summary.csv")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.judge == "gemini":
+        judge = GeminiJudge(args.model_name)
+    elif args.judge == "stub":
+        judge = StubJudge()
+    else:
+        _, url = start_stub_judge_server(rate_limit_every=7)
+        judge = HttpJudge(url)
+    evaluator = AsyncEvaluator(judge, EvaluationCache(args.cache), max_concurrency=args.concurrency,
+                               detailed_path=args.detailed, summary_path=args.summary)
+    _, summary = evaluator.evaluate(pd.read_csv(args.stories))
+    print("\n=== LLM‑Judge Evaluation Summary ===")
+    print(summary.to_string(index=False))
+
+if __name__ == "__main__":
+    main()
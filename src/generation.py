@@ -0,0 +1,648 @@
+import os
+import copy
+import time
+import json
+import queue
+import argparse
+import threading
+from collections import OrderedDict, Counter, deque
+from concurrent.futures import Future
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import torch
+from transformers import AutoTokenizer, AutoModelForCausalLM, GPT2Config, GPT2LMHeadModel, PreTrainedTokenizerFast
+from transformers.generation.streamers import BaseStreamer
+from speculative import speculative_generate, acceptance_summary
+from lore_index import LoreIndex
+
+BASE_MODEL_ID = "gpt2-xl"
+FINE_TUNED_MODEL_PATH = "../models/gpt2-xl-finetuned-full/final"
+# Where the fine-tuned checkpoint is mounted inside the Modal inference container
+MODAL_FINE_TUNED_MODEL_PATH = "/model/final"
+
+# Sampling settings used by generate_text / ft_inference in the notebook
+DEFAULT_GEN_KWARGS = {
+    "max_length": 200,
+    "do_sample": True,
+    "top_k": 50,
+    "top_p": 0.95,
+    "temperature": 0.9,
+}
+
+TINY_TOKENIZER_CORPUS = [
+    "Once upon a time in the world of League of Legends, on the land of Runeterra, there lived a champion named",
+    "Ashe, the Frost Archer, stalks her prey in the icy forests of Freljord. Continue the story:",
+    "Zed, the Master of Shadows, prepares his ultimate strike at dusk. Continue the tale:",
+    "Jinx, the Loose Cannon, plots her next explosive prank in Piltover. Continue:",
+]
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of `values` (q in 0..100); 0.0 for an empty list"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * q // 100))
+    return ordered[int(min(rank, len(ordered))) - 1]
+
+def latency_summary(latencies):
+    return {
+        "requests": len(latencies),
+        "p50_seconds": round(percentile(latencies, 50), 4),
+        "p95_seconds": round(percentile(latencies, 95), 4),
+        "mean_seconds": round(sum(latencies) / len(latencies), 4) if latencies else 0.0,
+    }
+
+def build_tiny_tokenizer(texts=TINY_TOKENIZER_CORPUS, vocab_size=400):
+    """Small byte-level BPE tokenizer trained in-process, so tests need no download"""
+    from tokenizers import Tokenizer, models, pre_tokenizers, decoders, trainers
+    tok = Tokenizer(models.BPE())
+    tok.pre_tokenizer = pre_tokenizers.ByteLevel(add_prefix_space=False)
+    tok.decoder = decoders.ByteLevel()
+    trainer = trainers.BpeTrainer(vocab_size=vocab_size, special_tokens=["<|endoftext|>"],
+                                  initial_alphabet=pre_tokenizers.ByteLevel.alphabet())
+    tok.train_from_iterator(texts, trainer)
+    return PreTrainedTokenizerFast(tokenizer_object=tok, bos_token="<|endoftext|>", eos_token="<|endoftext|>",
+                                   unk_token="<|endoftext|>", pad_token="<|endoftext|>")
+
+def build_tiny_gpt2(tokenizer, n_layer=2, n_head=2, n_embd=64, n_positions=256, seed=0):
+    """Randomly initialised GPT-2 with the real architecture but a few thousand parameters per layer"""
+    torch.manual_seed(seed)
+    config = GPT2Config(vocab_size=len(tokenizer), n_layer=n_layer, n_head=n_head, n_embd=n_embd,
+                        n_positions=n_positions, bos_token_id=tokenizer.eos_token_id,
+                        eos_token_id=tokenizer.eos_token_id)
+    return GPT2LMHeadModel(config)
+
+
+def _cache_nbytes(past_key_values):
+    layers = past_key_values.to_legacy_cache() if hasattr(past_key_values, "to_legacy_cache") else past_key_values
+    return sum(t.numel() * t.element_size() for layer in layers for t in layer)
+
+def _common_prefix_length(a, b):
+    n = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        n += 1
+    return n
+
+class PrefixCache:
+    """LRU cache of past_key_values for prompt prefixes, bounded by `max_bytes`.
+
+    Prefixes are either registered explicitly or promoted automatically once the same leading
+    tokens (at least `min_prefix_tokens` of them) have been seen `promote_after` times among
+    recent prompts."""
+    def __init__(self, max_bytes=256 * 2**20, min_prefix_tokens=8, promote_after=2, recent_prompts=64):
+        self.max_bytes = max_bytes
+        self.min_prefix_tokens = min_prefix_tokens
+        self.promote_after = promote_after
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.recent = deque(maxlen=recent_prompts)
+        self.candidates = Counter()
+        self.lock = threading.Lock()
+
+    def lookup(self, ids):
+        """Longest cached prefix of `ids` that leaves at least one token to prefill, or None"""
+        ids = tuple(ids)
+        with self.lock:
+            best = None
+            for prefix in self.entries:
+                if len(prefix) < len(ids) and ids[:len(prefix)] == prefix and (best is None or len(prefix) > len(best)):
+                    best = prefix
+            if best is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.entries.move_to_end(best)
+            return best, copy.deepcopy(self.entries[best][0])
+
+    def put(self, prefix, past_key_values):
+        prefix = tuple(prefix)
+        nbytes = _cache_nbytes(past_key_values)
+        if nbytes > self.max_bytes:
+            return
+        with self.lock:
+            if prefix in self.entries:
+                self.bytes -= self.entries.pop(prefix)[1]
+            self.entries[prefix] = (past_key_values, nbytes)
+            self.bytes += nbytes
+            while self.bytes > self.max_bytes:
+                _, (_, evicted) = self.entries.popitem(last=False)
+                self.bytes -= evicted
+                self.evictions += 1
+
+    def observe(self, ids):
+        """Record a prompt and return a frequently shared prefix worth caching, if one just qualified"""
+        ids = tuple(ids)
+        with self.lock:
+            shared = max((_common_prefix_length(ids, other) for other in self.recent), default=0)
+            self.recent.append(ids)
+            shared = min(shared, len(ids) - 1)
+            if shared < self.min_prefix_tokens:
+                return None
+            prefix = ids[:shared]
+            self.candidates[prefix] += 1
+            # +1 for the earlier prompt the prefix was first shared with
+            if self.candidates[prefix] + 1 >= self.promote_after and prefix not in self.entries:
+                del self.candidates[prefix]
+                return prefix
+            return None
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {"entries": len(self.entries), "bytes": self.bytes, "max_bytes": self.max_bytes,
+                "hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0}
+
+class _FirstTokenTimer(BaseStreamer):
+    """Streamer that only notes when generate() emits its first new token"""
+    def __init__(self):
+        self.calls = 0
+        self.first_token_at = None
+
+    def put(self, value):
+        # generate() first pushes the prompt, then each new token
+        self.calls += 1
+        if self.calls == 2:
+            self.first_token_at = time.perf_counter()
+
+    def end(self):
+        pass
+
+
+class GenerationService:
+    """Loads a causal LM once and keeps it resident to serve many generate() calls.
+
+    Load time is measured once in `load_seconds`; every generate() call adds its own latency to
+    `request_latencies`, so the two are never mixed up the way they were with per-call loading."""
+    def __init__(self, model_path=BASE_MODEL_ID, device=None, local_files_only=False, model=None, tokenizer=None,
+                 prefix_cache=None, draft_model_path=None, draft_model=None, lore_index=None):
+        self.model_path = model_path
+        self.prefix_cache = prefix_cache
+        self.lore_index = lore_index
+        self.ttft = {"prefix_hit": [], "prefix_miss": []}
+        self.speculative_stats = []
+        self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+        started = time.perf_counter()
+        if tokenizer is None:
+            tokenizer = AutoTokenizer.from_pretrained(model_path, padding_side="left", local_files_only=local_files_only)
+        tokenizer.padding_side = "left"
+        if tokenizer.pad_token is None:
+            tokenizer.pad_token = tokenizer.eos_token
+        if model is None:
+            model = AutoModelForCausalLM.from_pretrained(model_path, local_files_only=local_files_only)
+        model.config.pad_token_id = tokenizer.pad_token_id
+        if draft_model is None and draft_model_path is not None:
+            # the GPT-2 family shares one tokenizer, so a small GPT-2 can draft for GPT-2 XL
+            draft_model = AutoModelForCausalLM.from_pretrained(draft_model_path)
+        self.tokenizer = tokenizer
+        self.model = model.to(self.device).eval()
+        self.draft_model = draft_model.to(self.device).eval() if draft_model is not None else None
+        self.load_seconds = time.perf_counter() - started
+        self.request_latencies = []
+        self.lock = threading.Lock()
+        print(f"Model loaded from {model_path} in {self.load_seconds:.2f}s on {self.device}")
+
+    @classmethod
+    def tiny(cls, device="cpu", seed=0, prefix_cache=None, draft=False, **config):
+        """Service around a tiny random GPT-2 for CPU tests; no GPU or network needed.
+        With `draft`, an even smaller random GPT-2 is attached for speculative decoding."""
+        tokenizer = build_tiny_tokenizer()
+        draft_model = build_tiny_gpt2(tokenizer, n_layer=1, seed=seed + 1) if draft else None
+        return cls(model_path="tiny-gpt2", device=device, model=build_tiny_gpt2(tokenizer, seed=seed, **config),
+                   tokenizer=tokenizer, prefix_cache=prefix_cache, draft_model=draft_model)
+
+    def count_tokens(self, text):
+        with self.lock:
+            return len(self.tokenizer(text)["input_ids"])
+
+    def _prefill(self, ids):
+        with torch.inference_mode():
+            return self.model(torch.tensor([list(ids)], device=self.device), use_cache=True).past_key_values
+
+    def register_prefix(self, text):
+        """Precompute and cache the KV state of a prompt preamble shared by many prompts"""
+        if self.prefix_cache is None:
+            raise ValueError("this service was created without a prefix_cache")
+        with self.lock:
+            ids = self.tokenizer(text)["input_ids"]
+            self.prefix_cache.put(ids, self._prefill(ids))
+
+    def _generate_with_prefix(self, prompt, kwargs):
+        """Single-prompt generation seeded from the prefix cache, so only the suffix is prefilled"""
+        started = time.perf_counter()
+        timer = _FirstTokenTimer()
+        with self.lock:
+            ids = self.tokenizer(prompt)["input_ids"]
+            input_ids = torch.tensor([ids], device=self.device)
+            cached = self.prefix_cache.lookup(ids)
+            if cached is None:
+                promote = self.prefix_cache.observe(ids)
+                if promote is not None:
+                    self.prefix_cache.put(promote, self._prefill(promote))
+            with torch.inference_mode():
+                outputs = self.model.generate(
+                    input_ids=input_ids,
+                    attention_mask=torch.ones_like(input_ids),
+                    past_key_values=cached[1] if cached else None,
+                    streamer=timer,
+                    **kwargs,
+                    pad_token_id=self.tokenizer.pad_token_id,
+                    eos_token_id=self.tokenizer.eos_token_id,
+                )
+            text = self.tokenizer.decode(outputs[0], skip_special_tokens=True)
+        if timer.first_token_at is not None:
+            self.ttft["prefix_hit" if cached else "prefix_miss"].append(timer.first_token_at - started)
+        self.request_latencies.append(time.perf_counter() - started)
+        return text
+
+    def _generate_speculative(self, prompt, kwargs, num_draft_tokens):
+        """One prompt with the draft model proposing tokens for the main model to verify"""
+        started = time.perf_counter()
+        with self.lock, torch.inference_mode():
+            input_ids = self.tokenizer(prompt, return_tensors="pt").input_ids.to(self.device)
+            if kwargs.get("do_sample"):
+                max_new_tokens = kwargs.get("max_new_tokens") or kwargs["max_length"] - input_ids.size(1)
+                outputs, stats = speculative_generate(
+                    self.model, self.draft_model, input_ids, max_new_tokens=max_new_tokens,
+                    num_draft_tokens=num_draft_tokens, temperature=kwargs.get("temperature", 1.0),
+                    top_k=kwargs.get("top_k", 0), top_p=kwargs.get("top_p", 1.0),
+                    eos_token_id=self.tokenizer.eos_token_id)
+                self.speculative_stats.append(stats)
+            else:
+                # greedy: transformers' assisted generation already gives identical output
+                outputs = self.model.generate(input_ids, attention_mask=torch.ones_like(input_ids),
+                                              assistant_model=self.draft_model, **kwargs,
+                                              pad_token_id=self.tokenizer.pad_token_id,
+                                              eos_token_id=self.tokenizer.eos_token_id)
+            text = self.tokenizer.decode(outputs[0], skip_special_tokens=True)
+        self.request_latencies.append(time.perf_counter() - started)
+        return text
+
+    def _generate_with_lore(self, prompts, speculative, num_draft_tokens, gen_kwargs):
+        """Prepend retrieved lore to each prompt without eating into the story budget.
+
+        The caller's max_length is turned into max_new_tokens relative to the original prompts, and each
+        context is cut in tokens so context + prompt + new tokens still fit the model's position table."""
+        if self.lore_index is None:
+            raise ValueError("lore conditioning needs a lore_index (see lore_index.py)")
+        kwargs = {**DEFAULT_GEN_KWARGS, **gen_kwargs}
+        n_positions = getattr(self.model.config, "n_positions", None) or self.model.config.max_position_embeddings
+        separator = "\n\n"
+        raw_contexts = [self.lore_index.context_for(prompt) for prompt in prompts]
+        contexts = []
+        with self.lock:
+            prompt_lengths = [len(self.tokenizer(prompt)["input_ids"]) for prompt in prompts]
+            max_new_tokens = kwargs.get("max_new_tokens") or max(1, kwargs["max_length"] - max(prompt_lengths))
+            separator_length = len(self.tokenizer(separator)["input_ids"])
+            for context, prompt_length in zip(raw_contexts, prompt_lengths):
+                budget = n_positions - max_new_tokens - prompt_length - separator_length
+                ids = self.tokenizer(context)["input_ids"] if budget > 0 else []
+                contexts.append(self.tokenizer.decode(ids[:budget]).strip() if ids else "")
+        augmented = [f"{context}{separator}{prompt}" if context else prompt for context, prompt in zip(contexts, prompts)]
+        texts = self.generate(augmented, speculative, num_draft_tokens,
+                              **{**gen_kwargs, "max_length": None, "max_new_tokens": max_new_tokens})
+        return [text[len(context):].lstrip("\n") if context and text.startswith(context) else text
+                for context, text in zip(contexts, texts)]
+
+    def generate(self, prompts, speculative=False, num_draft_tokens=4, lore=False, **gen_kwargs):
+        """Generate one story per prompt in a single padded batch and return the decoded texts.
+        Single prompts go through the prefix cache when the service has one; with `speculative`,
+        prompts are decoded one by one with the draft model proposing `num_draft_tokens` at a time.
+        With `lore`, each prompt is conditioned on lore retrieved from the service's lore_index;
+        the retrieved context is stripped from the returned texts."""
+        if isinstance(prompts, str):
+            prompts = [prompts]
+        if lore:
+            return self._generate_with_lore(prompts, speculative, num_draft_tokens, gen_kwargs)
+        kwargs = {**DEFAULT_GEN_KWARGS, **gen_kwargs}
+        if speculative:
+            if self.draft_model is None:
+                raise ValueError("speculative decoding needs a draft model (draft_model_path=...)")
+            return [self._generate_speculative(prompt, kwargs, num_draft_tokens) for prompt in prompts]
+        if self.prefix_cache is not None and len(prompts) == 1:
+            return [self._generate_with_prefix(prompts[0], kwargs)]
+        started = time.perf_counter()
+        # the tokenizer is shared by every request thread and padding=True mutates its state,
+        # so it is only ever touched under the lock
+        with self.lock, torch.inference_mode():
+            inputs = self.tokenizer(prompts, return_tensors="pt", padding=True).to(self.device)
+            outputs = self.model.generate(
+                **inputs,
+                **kwargs,
+                pad_token_id=self.tokenizer.pad_token_id,
+                eos_token_id=self.tokenizer.eos_token_id,
+            )
+            texts = self.tokenizer.batch_decode(outputs, skip_special_tokens=True)
+        self.request_latencies.append(time.perf_counter() - started)
+        return texts
+
+    def stats(self):
+        stats = {"model": self.model_path, "device": str(self.device), "load_seconds": round(self.load_seconds, 3),
+                 **latency_summary(self.request_latencies)}
+        if self.speculative_stats:
+            stats["speculative"] = acceptance_summary(self.speculative_stats)
+        if self.prefix_cache is not None:
+            stats["prefix_cache"] = self.prefix_cache.stats()
+            for outcome, values in self.ttft.items():
+                stats[f"ttft_{outcome}_p50_seconds"] = round(percentile(values, 50), 4)
+        return stats
+
+
+class _BatchRequest:
+    __slots__ = ("model", "settings", "prompt", "gen_kwargs", "future", "enqueued")
+
+    def __init__(self, model, settings, prompt, gen_kwargs, future, enqueued):
+        self.model = model
+        self.settings = settings
+        self.prompt = prompt
+        self.gen_kwargs = gen_kwargs
+        self.future = future
+        self.enqueued = enqueued
+
+_STOP = object()
+
+class BatchingScheduler:
+    """Dynamic micro-batching in front of one or more GenerationServices.
+
+    Prompts are collected for at most `max_wait` seconds and grouped by model, generation settings
+    and prompt length (in buckets of `length_bucket` tokens, so left padding stays small). Each
+    group runs as one padded generate() of at most `max_batch_size` prompts, and every caller's
+    Future receives its own story."""
+    def __init__(self, services, max_batch_size=8, max_wait=0.02, length_bucket=16):
+        self.services = services
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.length_bucket = length_bucket
+        self.queue = queue.Queue()
+        self.latencies = []
+        self.batch_sizes = []
+        self.first_submit = None
+        self.last_completion = None
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def submit(self, prompt, model=None, **gen_kwargs):
+        """Queue one prompt and return a Future resolving to its generated story"""
+        model = model or next(iter(self.services))
+        if model not in self.services:
+            raise KeyError(f"unknown model {model!r}; have {sorted(self.services)}")
+        settings = json.dumps(gen_kwargs, sort_keys=True)
+        now = time.perf_counter()
+        if self.first_submit is None:
+            self.first_submit = now
+        future = Future()
+        self.queue.put(_BatchRequest(model, settings, prompt, gen_kwargs, future, now))
+        return future
+
+    def generate(self, prompt, model=None, **gen_kwargs):
+        """Blocking convenience wrapper around submit()"""
+        return self.submit(prompt, model, **gen_kwargs).result()
+
+    def _run(self):
+        pending = {}
+        while True:
+            timeout = None
+            if pending:
+                oldest = min(group[0].enqueued for group in pending.values())
+                timeout = max(0.0, oldest + self.max_wait - time.perf_counter())
+            try:
+                request = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                request = None
+            if request is _STOP:
+                for key, group in pending.items():
+                    self._dispatch(key, group)
+                return
+            if request is not None:
+                try:
+                    key = self._group_key(request)
+                except Exception as e:
+                    request.future.set_exception(e)
+                else:
+                    pending.setdefault(key, []).append(request)
+            now = time.perf_counter()
+            for key in list(pending):
+                group = pending[key]
+                if len(group) >= self.max_batch_size or now - group[0].enqueued >= self.max_wait:
+                    del pending[key]
+                    self._dispatch(key, group)
+
+    def _group_key(self, request):
+        # length is counted here on the scheduler thread, not on the submitting request threads,
+        # and under the service lock, so it never races a batch being tokenized
+        length = self.services[request.model].count_tokens(request.prompt)
+        return request.model, length // self.length_bucket, request.settings
+
+    def _dispatch(self, key, group):
+        model = key[0]
+        try:
+            stories = self.services[model].generate([r.prompt for r in group], **group[0].gen_kwargs)
+        except Exception as e:
+            for request in group:
+                request.future.set_exception(e)
+            return
+        done = time.perf_counter()
+        self.batch_sizes.append(len(group))
+        self.last_completion = done
+        for request, story in zip(group, stories):
+            self.latencies.append(done - request.enqueued)
+            request.future.set_result(story)
+
+    def close(self):
+        """Flush everything still queued and stop the scheduler thread"""
+        self.queue.put(_STOP)
+        self.thread.join()
+
+    def stats(self):
+        elapsed = (self.last_completion - self.first_submit) if self.latencies else 0.0
+        return {
+            "stories": len(self.latencies),
+            "batches": len(self.batch_sizes),
+            "mean_batch_size": round(sum(self.batch_sizes) / len(self.batch_sizes), 2) if self.batch_sizes else 0.0,
+            "stories_per_second": round(len(self.latencies) / elapsed, 3) if elapsed else 0.0,
+            **latency_summary(self.latencies),
+        }
+
+def benchmark_batching(services, prompts, repeats=1, max_batch_size=8, max_wait=0.02, **gen_kwargs):
+    """Compare the notebook's one-prompt-at-a-time loop with the batching scheduler.
+
+    Every story is requested at t=0 in both runs, so latency includes queueing behind earlier stories."""
+    requests = [(model, prompt) for _ in range(repeats) for prompt in prompts for model in services]
+
+    latencies = []
+    started = time.perf_counter()
+    for model, prompt in requests:
+        services[model].generate([prompt], **gen_kwargs)
+        latencies.append(time.perf_counter() - started)
+    sequential_seconds = time.perf_counter() - started
+    sequential = {"stories": len(requests), "stories_per_second": round(len(requests) / sequential_seconds, 3),
+                  **latency_summary(latencies)}
+
+    scheduler = BatchingScheduler(services, max_batch_size=max_batch_size, max_wait=max_wait)
+    futures = [scheduler.submit(prompt, model, **gen_kwargs) for model, prompt in requests]
+    for future in futures:
+        future.result()
+    scheduler.close()
+    batched = scheduler.stats()
+
+    print("\n=== Story generation: sequential vs micro-batched ===")
+    print(f"{'':>20} {'sequential':>12} {'batched':>12}")
+    for key in ("stories", "stories_per_second", "p50_seconds", "p95_seconds"):
+        print(f"{key:>20} {sequential[key]:>12} {batched[key]:>12}")
+    return {"sequential": sequential, "batched": batched}
+
+def benchmark_speculative(service, prompts, num_draft_tokens=4, **gen_kwargs):
+    """Wall-clock speedup and acceptance rate of speculative decoding over plain sampling, prompt by prompt"""
+    started = time.perf_counter()
+    for prompt in prompts:
+        service.generate([prompt], **gen_kwargs)
+    plain_seconds = time.perf_counter() - started
+    service.speculative_stats = []
+    started = time.perf_counter()
+    service.generate(prompts, speculative=True, num_draft_tokens=num_draft_tokens, **gen_kwargs)
+    speculative_seconds = time.perf_counter() - started
+    report = {"plain_seconds": round(plain_seconds, 3), "speculative_seconds": round(speculative_seconds, 3),
+              "speedup": round(plain_seconds / speculative_seconds, 3) if speculative_seconds else 0.0,
+              **acceptance_summary(service.speculative_stats)}
+    print("\n=== Speculative decoding ===")
+    for key, value in report.items():
+        print(f"{key:>28} {value}")
+    return report
+
+class GenerationRequestHandler(BaseHTTPRequestHandler):
+    """POST /generate {"prompts": [...], "model": "fine_tuned", "gen_kwargs": {...}}; GET /stats"""
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path != "/stats":
+            self._send_json(404, {"error": f"unknown path {self.path}"})
+            return
+        self._send_json(200, {name: service.stats() for name, service in self.server.services.items()})
+
+    def do_POST(self):
+        if self.path != "/generate":
+            self._send_json(404, {"error": f"unknown path {self.path}"})
+            return
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            name = request.get("model", next(iter(self.server.services)))
+            service = self.server.services[name]
+            started = time.perf_counter()
+            gen_kwargs = request.get("gen_kwargs", {})
+            if self.server.scheduler is not None:
+                futures = [self.server.scheduler.submit(p, name, **gen_kwargs) for p in request["prompts"]]
+                stories = [future.result() for future in futures]
+            else:
+                stories = service.generate(request["prompts"], **gen_kwargs)
+            self._send_json(200, {"model": name, "stories": stories, "latency_seconds": time.perf_counter() - started})
+        except KeyError as e:
+            self._send_json(400, {"error": f"missing or unknown field: {e}"})
+        except Exception as e:
+            self._send_json(500, {"error": f"{type(e).__name__}: {e}"})
+
+    def log_message(self, format, *args):
+        pass
+
+def serve(services, host="127.0.0.1", port=8000, scheduler=None):
+    """Serve {name: GenerationService} over local HTTP until interrupted.
+    With a BatchingScheduler, prompts from concurrent requests are batched together."""
+    server = ThreadingHTTPServer((host, port), GenerationRequestHandler)
+    server.services = services
+    server.scheduler = scheduler
+    print(f"Serving {', '.join(services)} on http://{host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nShutting down generation server.")
+    finally:
+        server.server_close()
+        if scheduler is not None:
+            scheduler.close()
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Keep GPT-2 models resident and serve story generation")
+    parser.add_argument("--base", default=None, help=f"base model id or path (e.g. {BASE_MODEL_ID})")
+    # inside the Modal inference container the mounted checkpoint is served without any flags
+    parser.add_argument("--fine-tuned", default=MODAL_FINE_TUNED_MODEL_PATH if os.path.isdir(MODAL_FINE_TUNED_MODEL_PATH) else None,
+                        help=f"fine-tuned checkpoint (e.g. {FINE_TUNED_MODEL_PATH}; defaults to "
+                             f"{MODAL_FINE_TUNED_MODEL_PATH} when it exists)")
+    parser.add_argument("--tiny", action="store_true", help="serve a tiny random GPT-2 instead (CPU, offline)")
+    parser.add_argument("--draft", default=None, help="small GPT-2 (e.g. gpt2) drafting tokens for speculative decoding")
+    parser.add_argument("--benchmark-speculative", action="store_true",
+                        help="report acceptance rate and speedup of speculative decoding instead of serving")
+    parser.add_argument("--device", default=None)
+    parser.add_argument("--quantize", action="store_true",
+                        help="serve the fine-tuned model as int8 on CPU (converted once, cached under ../models/quantized)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--batch-window-ms", type=float, default=None,
+                        help="micro-batch concurrent requests, waiting at most this long for a batch to fill")
+    parser.add_argument("--max-batch-size", type=int, default=8)
+    parser.add_argument("--prefix-cache-mb", type=float, default=None,
+                        help="cache KV state of shared prompt prefixes, using at most this many MB per model")
+    parser.add_argument("--register-prefix", action="append", default=[],
+                        help="prompt preamble to precompute in the prefix cache (repeatable)")
+    parser.add_argument("--lore-index", default=None,
+                        help="lore index directory (lore_index.py --build); requests may then set gen_kwargs.lore")
+    parser.add_argument("--benchmark-batching", action="store_true",
+                        help="compare sequential and micro-batched generation instead of serving")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    def new_prefix_cache():
+        return PrefixCache(int(args.prefix_cache_mb * 2**20)) if args.prefix_cache_mb else None
+
+    services = {}
+    if args.tiny:
+        services["tiny"] = GenerationService.tiny(device=args.device or "cpu", prefix_cache=new_prefix_cache(),
+                                                  draft=args.benchmark_speculative)
+    if args.base:
+        services["base"] = GenerationService(args.base, device=args.device, prefix_cache=new_prefix_cache(),
+                                             draft_model_path=args.draft)
+    if args.fine_tuned and args.quantize:
+        from quantize import load_quantized, use_all_cores
+        use_all_cores()
+        services["fine_tuned"] = GenerationService(args.fine_tuned, device="cpu", local_files_only=True,
+                                                   model=load_quantized(args.fine_tuned),
+                                                   prefix_cache=new_prefix_cache())
+    elif args.fine_tuned:
+        services["fine_tuned"] = GenerationService(args.fine_tuned, device=args.device, local_files_only=True,
+                                                   prefix_cache=new_prefix_cache(), draft_model_path=args.draft)
+    if not services:
+        raise SystemExit("Nothing to serve: pass --base, --fine-tuned and/or --tiny")
+    if args.lore_index:
+        index = LoreIndex(args.lore_index)
+        for service in services.values():
+            service.lore_index = index
+    for service in services.values():
+        if service.prefix_cache is not None:
+            for prefix in args.register_prefix:
+                service.register_prefix(prefix)
+    max_wait = (args.batch_window_ms if args.batch_window_ms is not None else 20.0) / 1000
+    if args.benchmark_speculative:
+        for service in services.values():
+            if service.draft_model is not None:
+                benchmark_speculative(service, TINY_TOKENIZER_CORPUS[1:], max_length=150)
+        return
+    if args.benchmark_batching:
+        benchmark_batching(services, TINY_TOKENIZER_CORPUS[1:], repeats=4, max_batch_size=args.max_batch_size,
+                           max_wait=max_wait, max_length=150)
+        return
+    scheduler = None
+    if args.batch_window_ms is not None:
+        scheduler = BatchingScheduler(services, max_batch_size=args.max_batch_size, max_wait=max_wait)
+    serve(services, args.host, args.port, scheduler)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+import os
+import re
+import json
+import time
+import argparse
+from collections import Counter
+import numpy as np
+from champion_store import read_champions, normalise_related
+
+INDEX_VERSION = 1
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+# Paragraphs shorter than this are merged with the next one so every chunk carries some context
+MIN_CHUNK_CHARS = 200
+MAX_CHUNK_CHARS = 1200
+LORE_FIELDS = ["full_biography", "full_story"]
+INDEX_COLUMNS = ["name", "region", "quote", "related_champions"] + LORE_FIELDS
+ARRAYS = ["term_offsets", "postings_chunks", "postings_weights", "chunk_champion", "chunk_text_offsets",
+          "champion_chunk_offsets", "related_offsets", "related_ids"]
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower())
+
+def _capitalised(words):
+    """True if every word starts with a capital, as a champion's name does ("Miss Fortune", "Nunu & Willump")
+    and the many roster names that are also ordinary words ("brand", "karma", "talon") mostly do not"""
+    return all(word[0].isupper() or not word[0].isalpha() for word in words.split())
+
+def _text(value):
+    # missing parquet fields come back from pandas as NaN floats
+    return value if isinstance(value, str) else ""
+
+def chunk_paragraphs(text, min_chars=MIN_CHUNK_CHARS, max_chars=MAX_CHUNK_CHARS):
+    """Split lore into paragraph chunks, merging short paragraphs up to roughly `max_chars`"""
+    chunks, current = [], ""
+    for paragraph in re.split(r"\n\s*\n|\n", _text(text)):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if current and len(current) >= min_chars or len(current) + len(paragraph) > max_chars:
+            if current:
+                chunks.append(current)
+            current = paragraph
+        else:
+            current = f"{current}\n{paragraph}" if current else paragraph
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def build_index(df, output_dir, k1=1.2, b=0.75):
+    """Build the BM25 index over biography/story chunks plus the related-champions adjacency table.
+
+    Postings are stored CSR-style (term_offsets into postings_chunks/postings_weights) with the full
+    BM25 term weight precomputed, so a query is just a sum over a few slices of memory-mapped arrays."""
+    os.makedirs(output_dir, exist_ok=True)
+    started = time.perf_counter()
+    records = df.to_dict("records")
+    names = [str(r["name"]).upper() for r in records]
+    name_ids = {name: i for i, name in enumerate(names)}
+
+    chunk_texts, chunk_champion, champion_chunk_offsets = [], [], [0]
+    for champion_id, record in enumerate(records):
+        for field in LORE_FIELDS:
+            for chunk in chunk_paragraphs(record.get(field)):
+                chunk_texts.append(chunk)
+                chunk_champion.append(champion_id)
+        champion_chunk_offsets.append(len(chunk_texts))
+
+    term_freqs = [Counter(tokenize(text)) for text in chunk_texts]
+    lengths = np.array([sum(tf.values()) for tf in term_freqs], dtype=np.float32)
+    avg_length = float(lengths.mean()) if len(lengths) else 0.0
+    postings = {}
+    for chunk_id, tf in enumerate(term_freqs):
+        for term, count in tf.items():
+            postings.setdefault(term, []).append((chunk_id, count))
+
+    terms = sorted(postings)
+    n_chunks = len(chunk_texts)
+    term_offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+    postings_chunks, postings_weights = [], []
+    for term_id, term in enumerate(terms):
+        entries = postings[term]
+        idf = np.log(1 + (n_chunks - len(entries) + 0.5) / (len(entries) + 0.5))
+        chunk_ids = np.array([chunk_id for chunk_id, _ in entries], dtype=np.int32)
+        tf = np.array([count for _, count in entries], dtype=np.float32)
+        norm = k1 * (1 - b + b * lengths[chunk_ids] / avg_length)
+        postings_chunks.append(chunk_ids)
+        postings_weights.append((idf * tf * (k1 + 1) / (tf + norm)).astype(np.float32))
+        term_offsets[term_id + 1] = term_offsets[term_id] + len(entries)
+
+    related_offsets, related_ids = [0], []
+    for record in records:
+        related_ids.extend(name_ids[n.upper()] for n in normalise_related(record.get("related_champions"))
+                           if n.upper() in name_ids)
+        related_offsets.append(len(related_ids))
+
+    encoded = [text.encode("utf-8") for text in chunk_texts]
+    arrays = {
+        "term_offsets": term_offsets,
+        "postings_chunks": np.concatenate(postings_chunks) if postings_chunks else np.zeros(0, np.int32),
+        "postings_weights": np.concatenate(postings_weights) if postings_weights else np.zeros(0, np.float32),
+        "chunk_champion": np.array(chunk_champion, dtype=np.int32),
+        "chunk_text_offsets": np.cumsum([0] + [len(e) for e in encoded], dtype=np.int64),
+        "champion_chunk_offsets": np.array(champion_chunk_offsets, dtype=np.int64),
+        "related_offsets": np.array(related_offsets, dtype=np.int64),
+        "related_ids": np.array(related_ids, dtype=np.int32),
+    }
+    for name, array in arrays.items():
+        np.save(os.path.join(output_dir, f"{name}.npy"), array)
+    with open(os.path.join(output_dir, "chunks.bin"), "wb") as f:
+        f.write(b"".join(encoded))
+    meta = {
+        "version": INDEX_VERSION,
+        "k1": k1,
+        "b": b,
+        "terms": terms,
+        "champions": names,
+        "regions": [_text(r.get("region")) for r in records],
+        "quotes": [_text(r.get("quote")) for r in records],
+    }
+    with open(os.path.join(output_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+    print(f"Indexed {n_chunks} chunks of {len(names)} champions ({len(terms)} terms) "
+          f"in {time.perf_counter() - started:.2f}s -> {output_dir}")
+    return LoreIndex(output_dir)
+
+
+class LoreIndex:
+    """Memory-mapped lore index: top-k BM25 chunk search and per-champion lore/related lookups"""
+    def __init__(self, index_dir):
+        self.index_dir = index_dir
+        with open(os.path.join(index_dir, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta["version"] != INDEX_VERSION:
+            raise ValueError(f"{index_dir} holds index version {meta['version']}, expected {INDEX_VERSION}; rebuild it")
+        self.term_ids = {term: i for i, term in enumerate(meta["terms"])}
+        self.champions = meta["champions"]
+        self.champion_ids = {name: i for i, name in enumerate(self.champions)}
+        self.regions = meta["regions"]
+        self.quotes = meta["quotes"]
+        for name in ARRAYS:
+            setattr(self, name, np.load(os.path.join(index_dir, f"{name}.npy"), mmap_mode="r"))
+        self.chunks = np.memmap(os.path.join(index_dir, "chunks.bin"), dtype=np.uint8, mode="r") \
+            if self.chunk_text_offsets[-1] else np.zeros(0, np.uint8)
+        # longest names first, so "Miss Fortune" wins over any shorter name it contains; case-insensitive
+        # so "LeBlanc"/"Leblanc" both match, with champions_in dropping lower-case hits like "brand"
+        self.name_pattern = re.compile(
+            r"\b(" + "|".join(re.escape(n) for n in sorted(self.champions, key=len, reverse=True)) + r")\b",
+            re.IGNORECASE) if self.champions else None
+
+    def __len__(self):
+        return len(self.chunk_champion)
+
+    def chunk_text(self, chunk_id):
+        start, end = self.chunk_text_offsets[chunk_id], self.chunk_text_offsets[chunk_id + 1]
+        return bytes(self.chunks[start:end]).decode("utf-8")
+
+    def _scores(self, text):
+        scores = np.zeros(len(self), dtype=np.float32)
+        for term in set(tokenize(text)):
+            term_id = self.term_ids.get(term)
+            if term_id is None:
+                continue
+            start, end = self.term_offsets[term_id], self.term_offsets[term_id + 1]
+            scores[self.postings_chunks[start:end]] += self.postings_weights[start:end]
+        return scores
+
+    def search(self, text, k=3, champion=None):
+        """Top-k (champion, score, chunk text) for free text, optionally restricted to one champion"""
+        scores = self._scores(text)
+        if champion is not None:
+            champion_id = self.champion_ids[champion.upper()]
+            start, end = self.champion_chunk_offsets[champion_id], self.champion_chunk_offsets[champion_id + 1]
+            candidates = np.arange(start, end)
+        else:
+            candidates = np.flatnonzero(scores)
+        if not len(candidates):
+            return []
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [(self.champions[self.chunk_champion[c]], float(scores[c]), self.chunk_text(c)) for c in candidates]
+
+    def related(self, champion):
+        champion_id = self.champion_ids[champion.upper()]
+        start, end = self.related_offsets[champion_id], self.related_offsets[champion_id + 1]
+        return [self.champions[i] for i in self.related_ids[start:end]]
+
+    def champion_lore(self, champion, k=2):
+        """The champion's first `k` lore chunks, in biography/story order"""
+        champion_id = self.champion_ids[champion.upper()]
+        start = self.champion_chunk_offsets[champion_id]
+        end = min(self.champion_chunk_offsets[champion_id + 1], start + k)
+        return [self.chunk_text(c) for c in range(start, end)]
+
+    def champions_in(self, text):
+        if self.name_pattern is None:
+            return []
+        found = []
+        for match in self.name_pattern.finditer(text):
+            if not _capitalised(match.group(1)):
+                continue
+            name = match.group(1).upper()
+            if name not in found:
+                found.append(name)
+        return found
+
+    def context_for(self, prompt, k=2, max_chars=1500):
+        """Lore to prepend to `prompt`: for each champion it names, region, quote, related champions
+        and its chunks most relevant to the prompt; otherwise the best chunks for the prompt text"""
+        parts = []
+        for champion in self.champions_in(prompt):
+            champion_id = self.champion_ids[champion]
+            header = f"{champion.title()}"
+            if self.regions[champion_id]:
+                header += f" of {self.regions[champion_id]}"
+            if self.quotes[champion_id]:
+                header += f": {self.quotes[champion_id]}"
+            related = self.related(champion)
+            if related:
+                header += f" Related: {', '.join(n.title() for n in related)}."
+            parts.append(header)
+            chunks = [text for _, score, text in self.search(prompt, k, champion) if score > 0]
+            parts.extend(chunks or self.champion_lore(champion, k))
+        if not parts:
+            parts = [text for _, _, text in self.search(prompt, k)]
+        return "\n".join(parts)[:max_chars].strip()
+
+    def augment_prompt(self, prompt, k=2, max_chars=1500):
+        context = self.context_for(prompt, k, max_chars)
+        return f"{context}\n\n{prompt}" if context else prompt
+
+
+def benchmark_queries(index, queries, repeats=20):
+    latencies = []
+    for _ in range(repeats):
+        for query in queries:
+            started = time.perf_counter()
+            index.context_for(query)
+            latencies.append(time.perf_counter() - started)
+    return latencies
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Build or query the lore retrieval index")
+    parser.add_argument("--parquet", default="../data/lol_champions_data.parquet")
+    parser.add_argument("--index-dir", default="../data/lore_index")
+    parser.add_argument("--build", action="store_true", help="(re)build the index from the parquet")
+    parser.add_argument("--query", default=None, help="free-text query")
+    parser.add_argument("--champion", default=None, help="restrict --query to, or show lore of, this champion")
+    parser.add_argument("--k", type=int, default=3)
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    index = build_index(read_champions(args.parquet, INDEX_COLUMNS), args.index_dir) if args.build else LoreIndex(args.index_dir)
+    if args.query:
+        for champion, score, text in index.search(args.query, args.k, args.champion):
+            print(f"[{champion} {score:.2f}] {text[:300]}\n")
+    elif args.champion:
+        print(f"Related: {', '.join(index.related(args.champion))}")
+        for text in index.champion_lore(args.champion, args.k):
+            print(f"{text[:300]}\n")
+    if args.query or args.champion:
+        print(f"Prompt context:\n{index.context_for(args.query or args.champion)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,393 @@
+import os
+import json
+import shutil
+import hashlib
+import argparse
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from datasets import Dataset, concatenate_datasets
+from transformers import AutoTokenizer
+from champion_store import read_champions
+
+# GPT-2's max context length is 1024
+CONTEXT_LENGTH = 1024
+# Label value ignored by the causal-LM loss in transformers
+IGNORE_INDEX = -100
+# Bump whenever build_text_to_embed changes so cached tokens built from the old template are not reused
+TEMPLATE_VERSION = 1
+SOURCE_FIELDS = ["name", "role", "race", "short_bio", "full_story"]
+# save_to_disk and sharded (--incremental) outputs live apart, so training never picks up stale shards
+DATASET_DIR = "../data/tokenised_ds"
+SHARDED_DATASET_DIR = "../data/tokenised_shards"
+
+
+def build_text_to_embed(df):
+    """Training text per champion, built exactly like the notebook's `text_to_embed` column"""
+    return (
+        df["name"].fillna("")     + " — " +
+        df["role"].fillna("")     + "\n" +
+        df["race"].fillna("")     + "\n" +
+        df["short_bio"].fillna("")+ "\n" +
+        df["full_story"].fillna("")
+    )
+
+def tokenize_documents(tokenizer, texts):
+    """Token ids for each document, without truncation or padding"""
+    return tokenizer(list(texts), add_special_tokens=False, verbose=False)["input_ids"]
+
+def _pad_block(ids, labels, block_size, pad_id):
+    padding = block_size - len(ids)
+    return (
+        ids + [pad_id] * padding,
+        [1] * len(ids) + [0] * padding,
+        labels + [IGNORE_INDEX] * padding,
+    )
+
+def pack_documents(token_lists, block_size=CONTEXT_LENGTH, separator_id=None, pad_id=None):
+    """Concatenate documents (each followed by `separator_id`) and cut the stream into dense blocks.
+
+    Only the final block can contain padding; its padded positions get attention_mask 0 and label
+    IGNORE_INDEX. Labels are explicit, so train with the default collator: DataCollatorForLanguageModeling
+    would rebuild them from input_ids and also mask every separator when pad == eos."""
+    stream = []
+    for ids in token_lists:
+        stream.extend(ids)
+        if separator_id is not None:
+            stream.append(separator_id)
+    columns = {"input_ids": [], "attention_mask": [], "labels": []}
+    for start in range(0, len(stream), block_size):
+        block = stream[start:start + block_size]
+        ids, mask, labels = _pad_block(block, list(block), block_size, pad_id)
+        columns["input_ids"].append(ids)
+        columns["attention_mask"].append(mask)
+        columns["labels"].append(labels)
+    return columns
+
+def sliding_windows(token_lists, block_size=CONTEXT_LENGTH, stride=768, separator_id=None, pad_id=None):
+    """One row per window of each document, moving `stride` tokens at a time.
+
+    Long stories are covered completely instead of being truncated at `block_size`. Tokens that an
+    earlier window already predicted are labelled IGNORE_INDEX so each token is learned once, while
+    still serving as context."""
+    if not 0 < stride <= block_size:
+        raise ValueError(f"stride must be in (0, {block_size}], got {stride}")
+    columns = {"input_ids": [], "attention_mask": [], "labels": []}
+    for ids in token_lists:
+        doc = list(ids) + ([separator_id] if separator_id is not None else [])
+        seen = 0
+        start = 0
+        while True:
+            window = doc[start:start + block_size]
+            labels = [IGNORE_INDEX if start + i < seen else token for i, token in enumerate(window)]
+            row = _pad_block(window, labels, block_size, pad_id)
+            columns["input_ids"].append(row[0])
+            columns["attention_mask"].append(row[1])
+            columns["labels"].append(row[2])
+            seen = start + len(window)
+            if seen >= len(doc):
+                break
+            start += stride
+    return columns
+
+def padded_baseline_stats(token_lists, block_size=CONTEXT_LENGTH, batch_size=1, grad_accum=8):
+    """Padding statistics of the original truncation=True, padding="max_length" tokenisation"""
+    lengths = [len(ids) for ids in token_lists]
+    real = sum(min(length, block_size) for length in lengths)
+    slots = len(lengths) * block_size
+    return {
+        "rows": len(lengths),
+        "real_tokens": real,
+        "padding_ratio": 1 - real / slots if slots else 0.0,
+        "truncated_tokens": sum(max(0, length - block_size) for length in lengths),
+        "effective_tokens_per_step": real / len(lengths) * batch_size * grad_accum if lengths else 0.0,
+    }
+
+def dataset_stats(columns, batch_size=1, grad_accum=8):
+    """Padding statistics of a packed or windowed dataset"""
+    rows = len(columns["input_ids"])
+    slots = sum(len(ids) for ids in columns["input_ids"])
+    real = sum(sum(mask) for mask in columns["attention_mask"])
+    return {
+        "rows": rows,
+        "real_tokens": real,
+        "padding_ratio": 1 - real / slots if slots else 0.0,
+        "truncated_tokens": 0,
+        "effective_tokens_per_step": real / rows * batch_size * grad_accum if rows else 0.0,
+    }
+
+def print_packing_report(before, after, strategy):
+    print("\n=== Tokenised dataset: padded vs " + strategy + " ===")
+    print(f"{'':>28} {'padded':>12} {strategy:>12}")
+    for key in ("rows", "real_tokens", "padding_ratio", "truncated_tokens", "effective_tokens_per_step"):
+        fmt = "{:>12.3f}" if key == "padding_ratio" else "{:>12.0f}"
+        print(f"{key:>28} " + fmt.format(before[key]) + " " + fmt.format(after[key]))
+
+def build_training_dataset(texts, tokenizer, block_size=CONTEXT_LENGTH, strategy="pack", stride=768,
+                           batch_size=1, grad_accum=8):
+    """Tokenise `texts` and pack (or window) them into a Trainer-ready Dataset with labels"""
+    token_lists = tokenize_documents(tokenizer, texts)
+    eos = tokenizer.eos_token_id
+    pad = tokenizer.pad_token_id if tokenizer.pad_token_id is not None else eos
+    if strategy == "pack":
+        columns = pack_documents(token_lists, block_size, separator_id=eos, pad_id=pad)
+    elif strategy == "window":
+        columns = sliding_windows(token_lists, block_size, stride, separator_id=eos, pad_id=pad)
+    else:
+        raise ValueError(f"strategy must be 'pack' or 'window', got {strategy!r}")
+    print_packing_report(padded_baseline_stats(token_lists, block_size, batch_size, grad_accum),
+                         dataset_stats(columns, batch_size, grad_accum), strategy)
+    ds = Dataset.from_dict(columns)
+    ds.set_format(type="torch", columns=["input_ids", "attention_mask", "labels"])
+    return ds
+
+def champion_fingerprint(row):
+    """Hash of the source fields a champion's training text is built from, plus the template version"""
+    values = [TEMPLATE_VERSION] + [None if pd.isna(row.get(field)) else row.get(field) for field in SOURCE_FIELDS]
+    return hashlib.sha256(json.dumps(values, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+def tokenizer_fingerprint(tokenizer):
+    """Hash identifying a tokenizer's behaviour: class, vocabulary and special tokens"""
+    h = hashlib.sha256()
+    h.update(f"{type(tokenizer).__name__}|{tokenizer.eos_token_id}|{tokenizer.pad_token_id}".encode())
+    h.update(json.dumps(sorted(tokenizer.get_vocab().items())).encode("utf-8"))
+    return h.hexdigest()
+
+def _write_token_table(entries, path):
+    table = pa.table({
+        "name": [name for name, _, _ in entries],
+        "fingerprint": [fingerprint for _, fingerprint, _ in entries],
+        "input_ids": pa.array([ids for _, _, ids in entries], type=pa.list_(pa.int32())),
+    })
+    tmp_path = path.with_suffix(".tmp")
+    pq.write_table(table, tmp_path)
+    os.replace(tmp_path, path)
+
+def _read_token_table(path):
+    table = pq.read_table(path)
+    columns = (table.column(c).to_pylist() for c in ("name", "fingerprint", "input_ids"))
+    return {name: (fingerprint, ids) for name, fingerprint, ids in zip(*columns)}
+
+class TokenCache:
+    """Per-champion token ids keyed by (tokenizer, template version), stored as one parquet file per
+    output shard (same shard_for assignment), so a build only loads and rewrites the shards that changed.
+
+    Champions re-tokenised while the source is streamed are staged in small per-batch files and
+    folded into their shard by merge(), so token ids are never held for more than one shard at a time."""
+    def __init__(self, cache_dir, tokenizer_fp, num_shards):
+        self.dir = Path(cache_dir) / f"tokens-{tokenizer_fp[:16]}-t{TEMPLATE_VERSION}-of{num_shards}"
+        self.staging_dir = self.dir / "staging"
+        # whatever an interrupted build staged is simply re-tokenised
+        shutil.rmtree(self.staging_dir, ignore_errors=True)
+        self.staging_dir.mkdir(parents=True)
+        self.staged = {}
+        self.staged_files = 0
+
+    def _path(self, shard):
+        return self.dir / f"shard-{shard:05d}.parquet"
+
+    def fingerprints(self, shard):
+        """{name: fingerprint} of one cache shard, read without its token ids"""
+        path = self._path(shard)
+        if not path.exists():
+            return {}
+        table = pq.read_table(path, columns=["name", "fingerprint"])
+        return dict(zip(table.column("name").to_pylist(), table.column("fingerprint").to_pylist()))
+
+    def stage(self, shard, entries):
+        """Spill freshly tokenised (name, fingerprint, ids) entries of `shard` until it is merged"""
+        path = self.staging_dir / f"shard-{shard:05d}-{self.staged_files:06d}.parquet"
+        self.staged_files += 1
+        _write_token_table(entries, path)
+        self.staged.setdefault(shard, []).append(path)
+
+    def merge(self, shard, members, cached_names):
+        """Token ids of `members` ((name, fingerprint) pairs, in order) from the shard file and its staged
+        entries. The shard file is rewritten only if champions were re-tokenised or removed."""
+        staged = self.staged.pop(shard, [])
+        path = self._path(shard)
+        entries = _read_token_table(path) if path.exists() else {}
+        for staged_path in staged:
+            entries.update(_read_token_table(staged_path))
+            staged_path.unlink()
+        names = [name for name, _ in members]
+        if staged or set(cached_names) != set(names):
+            _write_token_table([(name, *entries[name]) for name in names], path)
+        return [entries[name][1] for name in names]
+
+def iter_champion_batches(parquet_path, batch_size=1024):
+    """Stream the source fields of the champion parquet in record batches"""
+    parquet_file = pq.ParquetFile(parquet_path, memory_map=True)
+    columns = [c for c in SOURCE_FIELDS if c in parquet_file.schema_arrow.names]
+    for batch in parquet_file.iter_batches(batch_size=batch_size, columns=columns):
+        yield batch.to_pandas().reindex(columns=SOURCE_FIELDS)
+
+_worker_tokenizer = None
+
+def _init_tokenizer_worker(tokenizer_path):
+    global _worker_tokenizer
+    _worker_tokenizer = AutoTokenizer.from_pretrained(tokenizer_path)
+
+def _tokenize_chunk(texts):
+    return tokenize_documents(_worker_tokenizer, texts)
+
+def tokenize_parallel(tokenizer, texts, pool=None, chunk_size=256):
+    """Tokenise `texts`, spreading chunks over `pool` (see _init_tokenizer_worker) when one is given"""
+    if pool is None or len(texts) <= chunk_size:
+        return tokenize_documents(tokenizer, texts)
+    chunks = [texts[i:i + chunk_size] for i in range(0, len(texts), chunk_size)]
+    return [ids for chunk in pool.map(_tokenize_chunk, chunks) for ids in chunk]
+
+def shard_for(name, num_shards):
+    """Stable shard assignment, so editing one champion only ever touches one shard"""
+    return int(hashlib.sha1(name.encode("utf-8")).hexdigest()[:8], 16) % num_shards
+
+def _write_arrow_shard(columns, path):
+    table = pa.table({
+        "input_ids": pa.array(columns["input_ids"], type=pa.list_(pa.int32())),
+        "attention_mask": pa.array(columns["attention_mask"], type=pa.list_(pa.int8())),
+        "labels": pa.array(columns["labels"], type=pa.list_(pa.int64())),
+    })
+    tmp_path = path.with_suffix(".tmp")
+    with pa.OSFile(str(tmp_path), "wb") as sink, pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(tmp_path, path)
+
+def incremental_build(parquet_path, tokenizer_path, output_dir, cache_dir, num_shards=8, strategy="pack",
+                      block_size=CONTEXT_LENGTH, stride=768, num_proc=1, batch_size=1024):
+    """Re-tokenise only champions whose source fields changed and rewrite only the shards they live in.
+
+    Returns the list of shard files that changed, i.e. the only files that need syncing."""
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(tokenizer_path)
+    tokenizer.pad_token = tokenizer.eos_token
+    tok_fp = tokenizer_fingerprint(tokenizer)
+    cache = TokenCache(cache_dir, tok_fp, num_shards)
+    cached = [cache.fingerprints(shard) for shard in range(num_shards)]
+
+    members = [[] for _ in range(num_shards)]
+    seen = 0
+    retokenized = 0
+    # one pool for the whole build, so workers load the tokenizer once rather than once per batch
+    pool = ProcessPoolExecutor(num_proc, initializer=_init_tokenizer_worker,
+                               initargs=(tokenizer_path,)) if num_proc > 1 else None
+    try:
+        for df in iter_champion_batches(parquet_path, batch_size):
+            texts = build_text_to_embed(df).tolist()
+            stale = []
+            for (_, row), text in zip(df.iterrows(), texts):
+                name = row["name"]
+                fingerprint = champion_fingerprint(row)
+                shard = shard_for(name, num_shards)
+                members[shard].append((name, fingerprint))
+                if cached[shard].get(name) != fingerprint:
+                    stale.append((shard, name, fingerprint, text))
+            seen += len(df)
+            if stale:
+                token_lists = tokenize_parallel(tokenizer, [text for *_, text in stale], pool)
+                by_shard = {}
+                for (shard, name, fingerprint, _), ids in zip(stale, token_lists):
+                    by_shard.setdefault(shard, []).append((name, fingerprint, ids))
+                for shard, entries in by_shard.items():
+                    cache.stage(shard, entries)
+                retokenized += len(stale)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    manifest_path = output_dir / "manifest.json"
+    manifest = json.loads(manifest_path.read_text()) if manifest_path.exists() else {"shards": {}}
+    params = {"tokenizer": tok_fp, "template_version": TEMPLATE_VERSION, "strategy": strategy,
+              "block_size": block_size, "stride": stride}
+    eos = tokenizer.eos_token_id
+    changed = []
+    shards = {}
+    for shard, champions in enumerate(members):
+        filename = f"shard-{shard:05d}-of-{num_shards:05d}.arrow"
+        content_hash = hashlib.sha256(json.dumps([params, champions]).encode("utf-8")).hexdigest()
+        shards[filename] = {"content_hash": content_hash, "champions": len(champions)}
+        previous = manifest["shards"].get(filename)
+        output_current = bool(previous and previous["content_hash"] == content_hash and (output_dir / filename).exists())
+        cache_current = shard not in cache.staged and set(cached[shard]) == {name for name, _ in champions}
+        if output_current and cache_current:
+            continue
+        token_lists = cache.merge(shard, champions, cached[shard])
+        if output_current:
+            continue
+        if strategy == "pack":
+            columns = pack_documents(token_lists, block_size, separator_id=eos, pad_id=eos)
+        else:
+            columns = sliding_windows(token_lists, block_size, stride, separator_id=eos, pad_id=eos)
+        _write_arrow_shard(columns, output_dir / filename)
+        changed.append(filename)
+    for stale_file in set(manifest["shards"]) - set(shards):
+        (output_dir / stale_file).unlink(missing_ok=True)
+    manifest = {**params, "num_shards": num_shards, "shards": shards}
+    manifest_path.write_text(json.dumps(manifest, indent=2))
+
+    print(f"{seen} champions, {retokenized} re-tokenised, {len(changed)}/{num_shards} shards rewritten")
+    return changed
+
+def load_sharded_dataset(directory):
+    """Load the shards written by incremental_build as one Trainer-ready Dataset"""
+    directory = Path(directory)
+    manifest = json.loads((directory / "manifest.json").read_text())
+    ds = concatenate_datasets([Dataset.from_file(str(directory / name)) for name in sorted(manifest["shards"])])
+    ds.set_format(type="torch", columns=["input_ids", "attention_mask", "labels"])
+    return ds
+
+def sync_changed_shards(output_dir, changed, volume_name="data", remote_dir="/tokenized_shards"):
+    """Upload only the changed shards (and the manifest) to the Modal volume used for training"""
+    import modal
+    vol = modal.Volume.from_name(volume_name, create_if_missing=True)
+    with vol.batch_upload(force=True) as batch:
+        for filename in list(changed) + ["manifest.json"]:
+            batch.put_file(str(Path(output_dir) / filename), f"{remote_dir}/{filename}")
+    print(f"Uploaded {len(changed)} changed shards to volume '{volume_name}'")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Build the packed, tokenised training dataset from the champion parquet")
+    parser.add_argument("--parquet", default="../data/lol_champions_data.parquet")
+    parser.add_argument("--tokenizer", default="../models/gpt2-xl")
+    parser.add_argument("--output", default=None,
+                        help=f"defaults to {DATASET_DIR}, or {SHARDED_DATASET_DIR} with --incremental")
+    parser.add_argument("--strategy", choices=["pack", "window"], default="pack")
+    parser.add_argument("--block-size", type=int, default=CONTEXT_LENGTH)
+    parser.add_argument("--stride", type=int, default=768, help="window step for --strategy window")
+    parser.add_argument("--batch-size", type=int, default=1, help="per-device batch size, for the tokens/step report")
+    parser.add_argument("--grad-accum", type=int, default=8, help="gradient accumulation, for the tokens/step report")
+    parser.add_argument("--incremental", action="store_true",
+                        help="re-tokenise only changed champions and write sharded Arrow output")
+    parser.add_argument("--cache-dir", default="../data/token_cache",
+                        help="per-champion token cache for --incremental, sharded like the output")
+    parser.add_argument("--shards", type=int, default=8, help="number of output shards for --incremental")
+    parser.add_argument("--num-proc", type=int, default=1, help="tokenizer processes for --incremental")
+    parser.add_argument("--sync", action="store_true", help="upload changed shards to the Modal 'data' volume")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.incremental:
+        args.output = args.output or SHARDED_DATASET_DIR
+        changed = incremental_build(args.parquet, args.tokenizer, args.output, args.cache_dir, args.shards,
+                                    args.strategy, args.block_size, args.stride, args.num_proc)
+        if args.sync and changed:
+            sync_changed_shards(args.output, changed)
+        return
+    df = read_champions(args.parquet, SOURCE_FIELDS)
+    tokenizer = AutoTokenizer.from_pretrained(args.tokenizer)
+    tokenizer.pad_token = tokenizer.eos_token
+    ds = build_training_dataset(build_text_to_embed(df), tokenizer, args.block_size, args.strategy,
+                                args.stride, args.batch_size, args.grad_accum)
+    output = Path(args.output or DATASET_DIR)
+    # a manifest left by an earlier --incremental build here would make training load the old shards
+    for stale in [output / "manifest.json", *output.glob("shard-*.arrow")]:
+        stale.unlink(missing_ok=True)
+    ds.save_to_disk(output)
+    print(f"Tokenized dataset saved to {output}")
+
+if __name__ == "__main__":
+    main()
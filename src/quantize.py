@@ -0,0 +1,162 @@
+import os
+import json
+import math
+import time
+import hashlib
+import argparse
+from pathlib import Path
+import torch
+import transformers
+from torch import nn
+from transformers import AutoModelForCausalLM
+from transformers.pytorch_utils import Conv1D
+from champion_store import read_champions
+from lore_index import chunk_paragraphs
+from preprocess import shard_for
+from generation import FINE_TUNED_MODEL_PATH, TINY_TOKENIZER_CORPUS, GenerationService, latency_summary
+
+DEFAULT_CACHE_DIR = "../models/quantized"
+QUANTIZED_FORMAT_VERSION = 1
+
+
+def use_all_cores():
+    threads = os.cpu_count() or 1
+    torch.set_num_threads(threads)
+    return threads
+
+def _rss_bytes():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) * 1024
+    return 0
+
+def conv1d_to_linear(model):
+    """Swap GPT-2's Conv1D projections for equivalent nn.Linear layers, which dynamic quantization handles"""
+    for name, module in list(model.named_modules()):
+        for child_name, child in list(module.named_children()):
+            if isinstance(child, Conv1D):
+                linear = nn.Linear(child.weight.size(0), child.weight.size(1))
+                linear.weight.data = child.weight.data.t().contiguous()
+                linear.bias.data = child.bias.data
+                setattr(module, child_name, linear)
+    return model
+
+def quantize_model(model):
+    """int8 dynamic quantization of every linear layer (weights int8, activations quantized on the fly)"""
+    model = conv1d_to_linear(model.float().eval())
+    return torch.ao.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+
+def _artifact_key(model_path):
+    """Changes when the checkpoint files or the torch/transformers versions that pickled the model change"""
+    parts = [str(Path(model_path).resolve()), torch.__version__, transformers.__version__, str(QUANTIZED_FORMAT_VERSION)]
+    for path in sorted(Path(model_path).glob("*")):
+        if path.suffix in (".json", ".safetensors", ".bin"):
+            stat = path.stat()
+            parts.append(f"{path.name}:{stat.st_size}:{int(stat.st_mtime)}")
+    return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()[:16]
+
+def load_quantized(model_path=FINE_TUNED_MODEL_PATH, cache_dir=DEFAULT_CACHE_DIR):
+    """The int8 model for `model_path`, converted once and then loaded from `cache_dir`.
+
+    The whole quantized module is stored, so a cache hit never materialises the fp32 weights."""
+    artifact_dir = Path(cache_dir) / _artifact_key(model_path)
+    artifact = artifact_dir / "model.pt"
+    started = time.perf_counter()
+    if artifact.exists():
+        model = torch.load(artifact, weights_only=False)
+        print(f"Loaded int8 model from {artifact} in {time.perf_counter() - started:.2f}s")
+        return model
+    model = quantize_model(AutoModelForCausalLM.from_pretrained(model_path, torch_dtype=torch.float32))
+    artifact_dir.mkdir(parents=True, exist_ok=True)
+    torch.save(model, f"{artifact}.tmp")
+    os.replace(f"{artifact}.tmp", artifact)
+    (artifact_dir / "meta.json").write_text(json.dumps({
+        "model_path": str(model_path),
+        "torch": torch.__version__,
+        "transformers": transformers.__version__,
+        "format_version": QUANTIZED_FORMAT_VERSION,
+        "bytes": artifact.stat().st_size,
+    }, indent=2))
+    print(f"Quantized {model_path} to int8 in {time.perf_counter() - started:.2f}s -> {artifact}")
+    return model
+
+@torch.inference_mode()
+def perplexity(model, tokenizer, texts, block_size=1024):
+    """Token-weighted perplexity of `texts`, each scored in non-overlapping blocks of `block_size`"""
+    total_nll, total_tokens = 0.0, 0
+    for text in texts:
+        ids = tokenizer(text, return_tensors="pt").input_ids
+        for start in range(0, ids.size(1), block_size):
+            block = ids[:, start:start + block_size]
+            if block.size(1) < 2:
+                continue
+            loss = model(input_ids=block, labels=block).loss
+            total_nll += loss.item() * (block.size(1) - 1)
+            total_tokens += block.size(1) - 1
+    return math.exp(total_nll / total_tokens) if total_tokens else float("nan")
+
+def heldout_texts(store_path="../data/lol_champions_data.parquet", fraction=10, limit=20):
+    """Held-out lore for perplexity: full_biography paragraphs of the champions in one of `fraction`
+    stable hash buckets of their names. Biographies are not part of the fine-tuning text (see
+    preprocess.build_text_to_embed); the few paragraphs that repeat the short bio or story are dropped."""
+    df = read_champions(store_path, ["name", "short_bio", "full_story", "full_biography"])
+    df = df[df["name"].apply(lambda name: shard_for(name, fraction) == 0)]
+    texts = []
+    for row in df.itertuples():
+        if not isinstance(row.full_biography, str):
+            continue
+        trained = "\n".join(text for text in (row.short_bio, row.full_story) if isinstance(text, str))
+        unseen = [p.strip() for p in row.full_biography.split("\n") if p.strip() and p.strip() not in trained]
+        texts.extend(chunk_paragraphs("\n".join(unseen)))
+    return texts[:limit]
+
+def compare_fp32_int8(fp32_service, int8_service, prompts, texts, block_size=1024, **gen_kwargs):
+    """Batched generate latency, resident memory and perplexity on held-out `texts` of the fp32 and int8 services"""
+    results = {}
+    for name, service in (("fp32", fp32_service), ("int8", int8_service)):
+        service.request_latencies.clear()
+        for _ in range(3):
+            service.generate(prompts, **gen_kwargs)
+        results[name] = {
+            **latency_summary(service.request_latencies),
+            "load_seconds": round(service.load_seconds, 2),
+            "perplexity": round(perplexity(service.model, service.tokenizer, texts, block_size), 3),
+        }
+    print(f"\n{'':>6} {'load s':>8} {'p50 s':>8} {'p95 s':>8} {'ppl':>9}")
+    for name, row in results.items():
+        print(f"{name:>6} {row['load_seconds']:>8.2f} {row['p50_seconds']:>8.3f} {row['p95_seconds']:>8.3f} "
+              f"{row['perplexity']:>9.3f}")
+    return results
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="int8 CPU inference for the fine-tuned GPT-2")
+    parser.add_argument("--model", default=FINE_TUNED_MODEL_PATH)
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR)
+    parser.add_argument("--store", default="../data/lol_champions_data.parquet", help="champion store to take held-out biographies from")
+    parser.add_argument("--prompt", action="append", default=[], help="prompt to generate for (repeatable)")
+    parser.add_argument("--benchmark", action="store_true", help="compare fp32 and int8 latency, memory and perplexity")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    print(f"Using {use_all_cores()} CPU threads")
+    rss_before = _rss_bytes()
+    started = time.perf_counter()
+    int8 = GenerationService(args.model, device="cpu", model=load_quantized(args.model, args.cache_dir))
+    int8.load_seconds = time.perf_counter() - started
+    int8_rss = _rss_bytes() - rss_before
+    prompts = args.prompt or TINY_TOKENIZER_CORPUS[1:]
+    if not args.benchmark:
+        for story in int8.generate(prompts):
+            print(f"\n{story}")
+        return
+    rss_before = _rss_bytes()
+    fp32 = GenerationService(args.model, device="cpu", local_files_only=True)
+    fp32_rss = _rss_bytes() - rss_before
+    results = compare_fp32_int8(fp32, int8, prompts, heldout_texts(args.store), max_length=150)
+    print(f"\nResident memory added by loading: fp32 {fp32_rss / 2**20:.0f} MB, int8 {int8_rss / 2**20:.0f} MB")
+    return results
+
+if __name__ == "__main__":
+    main()
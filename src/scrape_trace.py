@@ -0,0 +1,159 @@
+import os
+import json
+import time
+import itertools
+import threading
+
+
+class _NullSpan:
+    """Shared do-nothing span handed out by a disabled tracer"""
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+_NULL_SPAN = _NullSpan()
+
+class Span:
+    __slots__ = ('tracer', 'name', 'attrs', 'id', 'parent', 'champion', 'started', 'child_seconds')
+
+    def __init__(self, tracer, name, attrs):
+        self.tracer = tracer
+        self.name = name
+        self.attrs = attrs
+        self.child_seconds = 0.0
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        local = self.tracer.local
+        stack = getattr(local, 'stack', None)
+        if stack is None:
+            stack = local.stack = []
+        parent = stack[-1] if stack else None
+        self.id = next(self.tracer.ids)
+        self.parent = parent.id if parent else None
+        self.champion = self.attrs.get('champion') or (parent.champion if parent else None)
+        stack.append(self)
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self.started
+        stack = self.tracer.local.stack
+        stack.pop()
+        if stack:
+            stack[-1].child_seconds += seconds
+        if exc_type is None:
+            status = 'ok'
+        elif 'Timeout' in exc_type.__name__:
+            status = 'timeout'
+        else:
+            status = 'error'
+        self.tracer._finish(self, seconds, status)
+        return False
+
+
+class Tracer:
+    """Timed spans for the scraper, written as JSON lines and aggregated for an end-of-run summary.
+
+    Spans nest per thread (a thread-local stack gives each span its parent), inherit the champion
+    they run under, and are buffered so the file is only touched every `buffer_size` spans. With
+    `enabled=False` every span is a shared no-op object."""
+    def __init__(self, path=None, enabled=True, buffer_size=256):
+        self.path = path
+        self.enabled = enabled
+        self.buffer_size = buffer_size
+        self.local = threading.local()
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()
+        self.buffer = []
+        self.t0 = time.perf_counter()
+        self.reset_summary()
+        if enabled and path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            open(path, 'w', encoding='utf-8').close()
+
+    def reset_summary(self):
+        self.by_name = {}
+        self.champion_seconds = {}
+
+    def span(self, name, **attrs):
+        if not self.enabled:
+            return _NULL_SPAN
+        return Span(self, name, attrs)
+
+    def _finish(self, span, seconds, status):
+        record = {'id': span.id, 'parent': span.parent, 'name': span.name, 'champion': span.champion,
+                  'thread': threading.current_thread().name, 'start': round(span.started - self.t0, 6),
+                  'seconds': round(seconds, 6), 'status': status}
+        if span.attrs:
+            record.update(span.attrs)
+        with self.lock:
+            stats = self.by_name.get(span.name)
+            if stats is None:
+                stats = self.by_name[span.name] = {'count': 0, 'seconds': 0.0, 'self_seconds': 0.0,
+                                                   'timeouts': 0, 'errors': 0}
+            stats['count'] += 1
+            stats['seconds'] += seconds
+            stats['self_seconds'] += seconds - span.child_seconds
+            if status == 'timeout':
+                stats['timeouts'] += 1
+            elif status == 'error':
+                stats['errors'] += 1
+            if span.name == 'champion':
+                self.champion_seconds[span.champion] = seconds
+            if self.path:
+                self.buffer.append(record)
+                if len(self.buffer) >= self.buffer_size:
+                    self._flush_locked()
+
+    def _flush_locked(self):
+        if not self.buffer:
+            return
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(''.join(json.dumps(r, ensure_ascii=False, default=str) + '\n' for r in self.buffer))
+        self.buffer = []
+
+    def flush(self):
+        if self.enabled and self.path:
+            with self.lock:
+                self._flush_locked()
+
+    def summary(self, slowest=5):
+        """Self time (excluding nested spans) per span name, so the shares add up to the traced time"""
+        with self.lock:
+            by_name = {name: dict(stats) for name, stats in self.by_name.items()}
+            champions = sorted(self.champion_seconds.items(), key=lambda item: item[1], reverse=True)[:slowest]
+        total = sum(stats['self_seconds'] for stats in by_name.values())
+        stages = [
+            {'name': name, 'count': stats['count'], 'seconds': round(stats['seconds'], 3),
+             'self_seconds': round(stats['self_seconds'], 3),
+             'share': round(stats['self_seconds'] / total, 4) if total else 0.0,
+             'timeouts': stats['timeouts'], 'errors': stats['errors']}
+            for name, stats in sorted(by_name.items(), key=lambda item: item[1]['self_seconds'], reverse=True)
+        ]
+        return {'traced_seconds': round(total, 3), 'stages': stages,
+                'slowest_champions': [{'champion': c, 'seconds': round(s, 3)} for c, s in champions]}
+
+    def print_summary(self, slowest=5):
+        if not self.enabled:
+            return
+        summary = self.summary(slowest)
+        print(f"\n=== Scrape trace: {summary['traced_seconds']:.1f}s traced ===")
+        print(f"{'stage':>12} {'count':>7} {'self s':>9} {'share':>7} {'timeouts':>9} {'errors':>7}")
+        for stage in summary['stages']:
+            print(f"{stage['name']:>12} {stage['count']:>7} {stage['self_seconds']:>9.2f} {stage['share']:>7.1%} "
+                  f"{stage['timeouts']:>9} {stage['errors']:>7}")
+        if summary['slowest_champions']:
+            print("Slowest champions: " + ", ".join(f"{c['champion']} ({c['seconds']:.1f}s)"
+                                                    for c in summary['slowest_champions']))
+        if self.path:
+            print(f"Spans written to {self.path}")
+
+NULL_TRACER = Tracer(enabled=False)
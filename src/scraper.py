@@ -1,6 +1,5 @@
 import time
 import json
-import pandas as pd
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.common.by import By
@@ -13,12 +12,169 @@ from tqdm import tqdm
 import random
 import re
 import traceback
+import os
+import queue
+import argparse
+import threading
+import mimetypes
+from urllib.parse import urlparse, unquote
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import snapshots
+import champion_store
+from snapshots import SnapshotCache
+from scrape_trace import Tracer, NULL_TRACER
+
+LIVE_BASE_URL = "https://universe.leagueoflegends.com"
+DEFAULT_REQUESTS_PER_SECOND = 1.0
+# How long an interrupted crawl waits for workers to finish their current champion before quitting their browsers
+WORKER_SHUTDOWN_TIMEOUT = 30
+
+ROLE_SELECTOR = ".typeDescription_ixWu h6, .playerType_3laO h6"
+RACE_SELECTOR = ".ChampionRace_a_Fp h6, .race_3k58 h6"
+QUOTE_SELECTOR = ".quote_2507 p, .championQuotes_3FLE p"
+SHORT_BIO_PARAGRAPH_SELECTOR = ".biographyText_3-to p, .biography_3YIe p"
+SHORT_BIO_CONTAINER_SELECTOR = ".biographyText_3-to, .biography_3YIe"
+RELATED_CHAMPION_SELECTOR = "ul.champions_jmhN li.champion_1xlO h5"
+CONTENT_CONTAINER_SELECTOR = "#CatchElement"
+CONTENT_PARAGRAPH_SELECTOR = "p.p_1_sJ"
+CHAMPION_LIST_SELECTORS = [
+    "li.item_30l8 a",
+    ".champsListUl_2Lmb li a",
+    "a[href*='/champion/']"
+]
+BIO_LINK_XPATH = "//a[.//button[.//span[contains(text(), 'Read Biography') or contains(text(), 'Read Bio')]]]|//a[contains(@href,'/story/champion/')]"
+STORY_LINK_XPATH = (
+    "//a[.//button[.//span[contains(text(), 'story') or contains(text(), 'Story')]]]|"
+    "//a[contains(@href,'/story/')][not(contains(@href, '/story/champion/'))]|"
+    "//a[contains(@href,'-color-story')]"
+)
+
+# Shared helpers for the extraction scripts; each script returns everything a page needs in one call.
+_EXTRACTION_HELPERS = """
+const first = (selector) => document.querySelector(selector);
+const visibleText = (el) => el ? (el.innerText || '').trim() : '';
+const linkHrefs = (xpath) => {
+    if (!xpath) return [];
+    const found = document.evaluate(xpath, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+    const hrefs = [];
+    for (let i = 0; i < found.snapshotLength; i++) hrefs.push(found.snapshotItem(i).href || '');
+    return hrefs;
+};
+"""
+
+DETAILS_EXTRACTION_SCRIPT = _EXTRACTION_HELPERS + """
+const [roleSel, raceSel, quoteSel, bioParagraphSel, bioContainerSel, relatedSel, bioLinkXpath] = arguments;
+let shortBio = visibleText(first(bioParagraphSel));
+let shortBioSelector = 'paragraph';
+if (!shortBio) {
+    shortBioSelector = 'container';
+    const containerText = visibleText(first(bioContainerSel));
+    const paragraphs = containerText.split('\\n').map(p => p.trim()).filter(p => p);
+    shortBio = paragraphs.length ? paragraphs[0] : containerText;
+}
+const related = [];
+for (const h5 of document.querySelectorAll(relatedSel)) {
+    const name = (h5.textContent || '').trim();
+    if (name && !related.includes(name)) related.push(name);
+}
+return {
+    role: visibleText(first(roleSel)),
+    race: visibleText(first(raceSel)),
+    quote: visibleText(first(quoteSel)),
+    short_bio: shortBio,
+    short_bio_selector: shortBioSelector,
+    related_champions: related,
+    bio_links: linkHrefs(bioLinkXpath),
+};
+"""
+
+CONTENT_EXTRACTION_SCRIPT = _EXTRACTION_HELPERS + """
+const [containerSel, paragraphSel, linkXpath] = arguments;
+const container = first(containerSel);
+const paragraphs = container ? Array.from(container.querySelectorAll(paragraphSel)) : [];
+return {
+    container_found: !!container,
+    paragraph_count: paragraphs.length,
+    paragraphs: paragraphs.map(p => (p.textContent || '').trim()).filter(t => t),
+    links: linkHrefs(linkXpath),
+};
+"""
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, bursts of up to `capacity`"""
+    def __init__(self, rate, capacity=1):
+        if rate <= 0:
+            raise ValueError(f"rate must be positive, got {rate}")
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = float(capacity)
+        self.last_refill = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available, then consume it"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.rate)
+                self.last_refill = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class HostRateLimiter:
+    """One token bucket per host, shared by every worker that talks to that host"""
+    def __init__(self, requests_per_second=DEFAULT_REQUESTS_PER_SECOND, burst=1, host_rates=None):
+        self.requests_per_second = requests_per_second
+        self.burst = burst
+        self.host_rates = host_rates or {}
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def acquire(self, url):
+        """Wait for this request's turn in the budget of the URL's host"""
+        host = urlparse(url).netloc
+        with self.lock:
+            bucket = self.buckets.get(host)
+            if bucket is None:
+                bucket = TokenBucket(self.host_rates.get(host, self.requests_per_second), self.burst)
+                self.buckets[host] = bucket
+        bucket.acquire()
+
 
 class LoLChampionScraper:
-    def __init__(self):
-        self.champions_url = "https://universe.leagueoflegends.com/en_US/champions/"
-        self.base_url = "https://universe.leagueoflegends.com"
+    _driver_path = None
+    _driver_path_lock = threading.Lock()
+
+    def __init__(self, base_url=LIVE_BASE_URL, headless=False, rate_limiter=None, extraction_mode='batched',
+                 snapshot_cache=None, max_snapshot_age=None, replay=False, tracer=None):
+        if extraction_mode not in ('batched', 'per_element'):
+            raise ValueError(f"extraction_mode must be 'batched' or 'per_element', got {extraction_mode!r}")
+        if replay and snapshot_cache is None:
+            raise ValueError("replay mode needs a snapshot_cache to read pages from")
+        self.base_url = base_url.rstrip('/')
+        self.champions_url = f"{self.base_url}/en_US/champions/"
+        self.headless = headless
+        self.rate_limiter = rate_limiter
+        self.extraction_mode = extraction_mode
+        self.extraction_timings = []
+        self.snapshot_cache = snapshot_cache
+        self.max_snapshot_age = max_snapshot_age
+        self.replay = replay
+        self.page = None  # parsed snapshot of the current page when it was not loaded in the browser
+        self.current_url = None
         self.champions_data = []
+        self.last_run_stats = {}
+        self.failed_pages = []  # pages of the current champion that could not be loaded
+        self.tracer = tracer or NULL_TRACER
+        self.driver = None
+        if replay:
+            print("Replay mode: extracting from snapshots, no WebDriver started")
+            return
 
         self.chrome_options = Options()
         self.chrome_options.add_argument("--window-size=1920,1080")
@@ -26,134 +182,242 @@ class LoLChampionScraper:
         self.chrome_options.add_argument("--no-sandbox")
         self.chrome_options.add_argument("--disable-dev-shm-usage")
         self.chrome_options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/100.0.4896.88 Safari/537.36") # Example user agent
-        self.driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=self.chrome_options)
+        if headless:
+            self.chrome_options.add_argument("--headless=new")
+        self.driver = webdriver.Chrome(service=Service(self._get_driver_path()), options=self.chrome_options)
         print("WebDriver Initialized")
 
+    @classmethod
+    def _get_driver_path(cls):
+        """Install chromedriver once per process, even when several workers start together"""
+        with cls._driver_path_lock:
+            if cls._driver_path is None:
+                cls._driver_path = ChromeDriverManager().install()
+            return cls._driver_path
+
+    def _spawn_worker(self):
+        """Create another scraper with its own browser, sharing this scraper's rate limiter"""
+        worker = LoLChampionScraper(base_url=self.base_url, headless=self.headless,
+                                    rate_limiter=self.rate_limiter, extraction_mode=self.extraction_mode,
+                                    snapshot_cache=self.snapshot_cache, max_snapshot_age=self.max_snapshot_age,
+                                    replay=self.replay, tracer=self.tracer)
+        worker.extraction_timings = self.extraction_timings
+        return worker
+
+    def _wait(self, timeout, condition, target):
+        """WebDriverWait(...).until(condition) inside a 'wait' span (status 'timeout' when it gives up)"""
+        with self.tracer.span('wait', target=target, timeout=timeout):
+            return WebDriverWait(self.driver, timeout).until(condition)
+
+    def _sleep(self, seconds):
+        with self.tracer.span('sleep'):
+            time.sleep(seconds)
+
+    def _load_snapshot(self, url):
+        """Parse the cached snapshot of `url` instead of visiting it when replaying or when it is still fresh"""
+        self.page = None
+        self.current_url = url
+        if self.snapshot_cache is None:
+            return False
+        if not self.replay and not self.snapshot_cache.is_fresh(url, self.max_snapshot_age):
+            return False
+        html = self.snapshot_cache.get(url)
+        if html is None:
+            raise LookupError(f"No snapshot cached for {url}")
+        self.page = snapshots.parse_html(html, url)
+        return True
+
+    def _store_snapshot(self):
+        """Save the rendered HTML of the page the browser is on"""
+        if self.snapshot_cache is None or self.page is not None:
+            return
+        try:
+            with self.tracer.span('snapshot'):
+                self.snapshot_cache.put(self.current_url, self.driver.page_source)
+        except Exception as e:
+            print(f"  Warn: Could not store snapshot of {self.current_url}: {e}")
+
+    def _navigate(self, url):
+        """Load a page and wait for <body>, paced by the rate limiter (or the polite sleep without one)"""
+        with self.tracer.span('navigate', url=url) as span:
+            if self._load_snapshot(url):
+                span.set(snapshot=True)
+                return
+            if self.rate_limiter:
+                with self.tracer.span('rate_limit'):
+                    self.rate_limiter.acquire(url)
+            with self.tracer.span('page_load'):
+                self.driver.get(url)
+            self._wait(15, EC.presence_of_element_located((By.CSS_SELECTOR, "body")), "body")
+            if not self.rate_limiter:
+                self._sleep(1 + random.random())
+
     def extract_champions_list(self):
-        """Extract list of champions using Selenium"""
-        self.driver.get(self.champions_url)
-        time.sleep(5)
-        selectors = [
-            "li.item_30l8 a",
-            ".champsListUl_2Lmb li a",
-            "a[href*='/champion/']"
-        ]
+        """Extract list of champions using Selenium (or from its snapshot)"""
+        with self.tracer.span('list'):
+            return self._extract_champions_list()
+
+    def _extract_champions_list(self):
+        if self._load_snapshot(self.champions_url):
+            selector, champions = snapshots.champions_list_payload(self.page, CHAMPION_LIST_SELECTORS, self.base_url)
+            if champions:
+                print(f"  Successfully extracted champion list from snapshot using selector: {selector}")
+            print(f"Found {len(champions)} unique champions")
+            return champions
+        if self.rate_limiter:
+            with self.tracer.span('rate_limit'):
+                self.rate_limiter.acquire(self.champions_url)
+        with self.tracer.span('page_load'):
+            self.driver.get(self.champions_url)
+        self._sleep(5)
         champions = []
         timeout = 10
-        for selector in selectors:
+        for selector in CHAMPION_LIST_SELECTORS:
             try:
-                WebDriverWait(self.driver, timeout).until(
-                    EC.presence_of_element_located((By.CSS_SELECTOR, selector))
-                )
-                champion_elements = self.driver.find_elements(By.CSS_SELECTOR, selector)
-                if champion_elements:
-                    for element in champion_elements:
-                        try:
-                            url = element.get_attribute("href")
-                            if not url or not url.startswith(self.base_url):
-                                continue
-                            name_element = element.find_element(By.CSS_SELECTOR, "h1") if element.find_elements(By.CSS_SELECTOR, "h1") else None
-                            region_element = element.find_element(By.CSS_SELECTOR, "h2") if element.find_elements(By.CSS_SELECTOR, "h2") else None
-                            name = name_element.text.strip() if name_element and name_element.text else ""
-                            region = region_element.text.strip() if region_element and region_element.text else ""
-                            if name and url and not any(c['name'] == name.upper() for c in champions):
-                                champions.append({'name': name.upper(), 'region': region, 'url': url})
-                        except Exception as e: print(f"  Warn: Error processing a champion list element: {e}")
-                    if champions:
-                        print(f"  Successfully extracted champion list using selector: {selector}")
-                        break
+                with self.tracer.span('selector', selector=selector) as span:
+                    self._wait(timeout, EC.presence_of_element_located((By.CSS_SELECTOR, selector)), selector)
+                    champion_elements = self.driver.find_elements(By.CSS_SELECTOR, selector)
+                    if champion_elements:
+                        for element in champion_elements:
+                            try:
+                                url = element.get_attribute("href")
+                                if not url or not url.startswith(self.base_url):
+                                    continue
+                                name_element = element.find_element(By.CSS_SELECTOR, "h1") if element.find_elements(By.CSS_SELECTOR, "h1") else None
+                                region_element = element.find_element(By.CSS_SELECTOR, "h2") if element.find_elements(By.CSS_SELECTOR, "h2") else None
+                                name = name_element.text.strip() if name_element and name_element.text else ""
+                                region = region_element.text.strip() if region_element and region_element.text else ""
+                                if name and url and not any(c['name'] == name.upper() for c in champions):
+                                    champions.append({'name': name.upper(), 'region': region, 'url': url})
+                            except Exception as e: print(f"  Warn: Error processing a champion list element: {e}")
+                        span.set(champions=len(champions))
+                        if champions:
+                            print(f"  Successfully extracted champion list using selector: {selector}")
+                            self._store_snapshot()
+                            break
             except TimeoutException: print(f"  Selector {selector} timed out.")
             except Exception as e: print(f"  Selector {selector} failed with error: {e}")
         print(f"Found {len(champions)} unique champions")
         return champions
 
+    def _record_extraction_time(self, page, started):
+        elapsed = time.perf_counter() - started
+        mode = 'snapshot' if self.page is not None else self.extraction_mode
+        self.extraction_timings.append({'page': page, 'mode': mode, 'seconds': elapsed})
+        print(f"  Extracted {page} page in {elapsed * 1000:.1f} ms ({mode})")
+
+    @staticmethod
+    def _pick_link(hrefs, preferred):
+        """First href satisfying `preferred`, else the first href found (as the original XPath fallbacks did)"""
+        for href in hrefs:
+            if href and preferred(href):
+                return href
+        return hrefs[0] if hrefs else ""
+
+    def _details_payload_per_element(self):
+        """Collect the details-page payload with one WebDriver call per element (the original approach)"""
+        payload = {'role': '', 'race': '', 'quote': '', 'short_bio': '', 'short_bio_selector': 'paragraph',
+                   'related_champions': [], 'bio_links': []}
+        try:
+            role_elements = self.driver.find_elements(By.CSS_SELECTOR, ROLE_SELECTOR)
+            payload['role'] = role_elements[0].text.strip() if role_elements else ""
+        except Exception: pass
+        try:
+            race_elements = self.driver.find_elements(By.CSS_SELECTOR, RACE_SELECTOR)
+            payload['race'] = race_elements[0].text.strip() if race_elements else ""
+        except Exception: pass
+        try:
+            quote_elements = self.driver.find_elements(By.CSS_SELECTOR, QUOTE_SELECTOR)
+            payload['quote'] = quote_elements[0].text.strip() if quote_elements else ""
+        except Exception: pass
+        try:
+            bio_elements = self.driver.find_elements(By.CSS_SELECTOR, SHORT_BIO_PARAGRAPH_SELECTOR)
+            if bio_elements and bio_elements[0].text.strip():
+                payload['short_bio'] = bio_elements[0].text.strip()
+            else:
+                payload['short_bio_selector'] = 'container'
+                with self.tracer.span('selector', selector=SHORT_BIO_CONTAINER_SELECTOR):
+                    bio_containers = self.driver.find_elements(By.CSS_SELECTOR, SHORT_BIO_CONTAINER_SELECTOR)
+                    container_text = bio_containers[0].text.strip() if bio_containers else ""
+                paragraphs = [p.strip() for p in container_text.split('\n') if p.strip()]
+                payload['short_bio'] = paragraphs[0] if paragraphs else container_text
+        except Exception as e:
+            print(f"  Warn: Error extracting short bio: {e}")
+        try:
+            for i, elem in enumerate(self.driver.find_elements(By.CSS_SELECTOR, RELATED_CHAMPION_SELECTOR)):
+                try:
+                    champion_name = self.driver.execute_script("return arguments[0].textContent;", elem).strip()
+                    if champion_name and champion_name not in payload['related_champions']:
+                        payload['related_champions'].append(champion_name)
+                except Exception as inner_e:
+                    print(f"    Warn: Error processing related champion element {i+1}: {type(inner_e).__name__} - {inner_e}")
+        except Exception as e:
+            print(f"  Warn: An unexpected error occurred while finding/processing related champions: {type(e).__name__} - {e}")
+        try:
+            payload['bio_links'] = [el.get_attribute('href') or "" for el in self.driver.find_elements(By.XPATH, BIO_LINK_XPATH)]
+        except Exception as e:
+            print(f"  Warn: Could not find biography links: {e}")
+        return payload
+
+    def extract_details_payload(self):
+        """Role, race, quote, short bio, related champions and bio links of the loaded champion page"""
+        started = time.perf_counter()
+        selectors = (ROLE_SELECTOR, RACE_SELECTOR, QUOTE_SELECTOR, SHORT_BIO_PARAGRAPH_SELECTOR,
+                     SHORT_BIO_CONTAINER_SELECTOR, RELATED_CHAMPION_SELECTOR, BIO_LINK_XPATH)
+        with self.tracer.span('extract', page='details') as span:
+            if self.page is not None:
+                payload = snapshots.details_payload(self.page, *selectors)
+            elif self.extraction_mode == 'per_element':
+                payload = self._details_payload_per_element()
+            else:
+                payload = self.driver.execute_script(DETAILS_EXTRACTION_SCRIPT, *selectors)
+            # which short-bio selector matched, so the trace shows how often the container fallback fires
+            span.set(short_bio_selector=payload.get('short_bio_selector'))
+        self._record_extraction_time('details', started)
+        return payload
+
     def extract_champion_details(self, champion_data):
         """Extract detailed information for a specific champion's main page"""
         print(f"Extracting details for {champion_data['name']}...")
         if not champion_data.get('url'):
             print(f"  Error: Missing URL for {champion_data['name']}")
+            self.failed_pages.append('details')
             return champion_data
         try:
-            self.driver.get(champion_data['url'])
-            WebDriverWait(self.driver, 15).until(EC.presence_of_element_located((By.CSS_SELECTOR, "body")))
-            time.sleep(1 + random.random())
+            self._navigate(champion_data['url'])
         except Exception as e:
             print(f"  Error navigating to champion page {champion_data['url']}: {e}")
+            self.failed_pages.append('details')
             return champion_data
 
-        # Extract Role, Race, Quote, Short Bio
-        try:
-            role_element = WebDriverWait(self.driver, 5).until(EC.presence_of_element_located((By.CSS_SELECTOR, ".typeDescription_ixWu h6, .playerType_3laO h6")))
-            champion_data['role'] = role_element.text.strip()
-        except: champion_data['role'] = ""
-        try:
-            race_elements = self.driver.find_elements(By.CSS_SELECTOR, ".ChampionRace_a_Fp h6, .race_3k58 h6")
-            champion_data['race'] = race_elements[0].text.strip() if race_elements else ""
-        except: champion_data['race'] = ""
-        try:
-            quote_elements = self.driver.find_elements(By.CSS_SELECTOR, ".quote_2507 p, .championQuotes_3FLE p")
-            champion_data['quote'] = quote_elements[0].text.strip() if quote_elements else ""
-        except: champion_data['quote'] = ""
-        
-        # IMPROVED: Extract short bio with multiple selectors and approaches
+        # The page renders client-side; give the role block a moment to appear before reading it
+        if self.page is None:
+            try:
+                self._wait(5, EC.presence_of_element_located((By.CSS_SELECTOR, ROLE_SELECTOR)), "role")
+            except TimeoutException:
+                print("  Info: Role element not found within timeout.")
+            self._store_snapshot()
         try:
-            # First try the original approach
-            bio_elements = self.driver.find_elements(By.CSS_SELECTOR, ".biographyText_3-to p, .biography_3YIe p")
-            if bio_elements and bio_elements[0].text.strip():
-                champion_data['short_bio'] = bio_elements[0].text.strip()
-            else:
-                # Try getting the text from the div container directly
-                bio_containers = self.driver.find_elements(By.CSS_SELECTOR, ".biographyText_3-to, .biography_3YIe")
-                if bio_containers:
-                    container_text = bio_containers[0].text.strip()
-                    if container_text:
-                        # Split by newlines and take the first paragraph if multiple exist
-                        paragraphs = [p.strip() for p in container_text.split('\n') if p.strip()]
-                        if paragraphs:
-                            champion_data['short_bio'] = paragraphs[0]
-                        else:
-                            champion_data['short_bio'] = container_text
-                    else:
-                        champion_data['short_bio'] = ""
-                else:
-                    champion_data['short_bio'] = ""
+            payload = self.extract_details_payload()
         except Exception as e:
-            print(f"  Warn: Error extracting short bio: {e}")
-            champion_data['short_bio'] = ""
-
-        # Extract Related Champions
-        related_champions = []
-        try:
-            h5_locator = (By.CSS_SELECTOR, "ul.champions_jmhN li.champion_1xlO h5")
-            WebDriverWait(self.driver, 3).until(EC.presence_of_element_located(h5_locator))
-            related_elements = self.driver.find_elements(*h5_locator)
-            if related_elements:
-                for i, elem in enumerate(related_elements):
-                    try:
-                        champion_name = self.driver.execute_script("return arguments[0].textContent;", elem).strip()
-                        if champion_name and champion_name not in related_champions:
-                            related_champions.append(champion_name)
-                    except Exception as inner_e: 
-                        print(f"    Warn: Error processing related champion element {i+1}: {type(inner_e).__name__} - {inner_e}")
-        except Exception as e: 
-            print(f"  Warn: An unexpected error occurred while finding/processing related champions: {type(e).__name__} - {e}")
-        champion_data['related_champions'] = related_champions
+            print(f"  Warn: Error extracting champion details: {type(e).__name__} - {e}")
+            payload = {}
+
+        champion_data['role'] = payload.get('role', "")
+        champion_data['race'] = payload.get('race', "")
+        champion_data['quote'] = payload.get('quote', "")
+        champion_data['short_bio'] = payload.get('short_bio', "")
+        champion_data['related_champions'] = payload.get('related_champions', [])
         print(f"  Assigned related champions list: {champion_data['related_champions']}")
 
         # Find Biography URL
-        try:
-            bio_link_elements = self.driver.find_elements(By.XPATH, "//a[.//button[.//span[contains(text(), 'Read Biography') or contains(text(), 'Read Bio')]]]|//a[contains(@href,'/story/champion/')]")
-            found_bio_url = ""
-            if bio_link_elements:
-                for link_el in bio_link_elements:
-                    href = link_el.get_attribute('href')
-                    if href and '/story/champion/' in href: found_bio_url = href; break
-                if not found_bio_url: found_bio_url = bio_link_elements[0].get_attribute('href')
-            if found_bio_url: champion_data['bio_url'] = found_bio_url
-            else:
-                clean_name = re.sub(r'[^a-z0-9]', '', champion_data['name'].lower()); bio_url = f"{self.base_url}/en_US/story/champion/{clean_name}/"; champion_data['bio_url'] = bio_url; print(f"  Warn: Could not find bio button/link, constructed fallback URL: {bio_url}")
-        except Exception as e: 
-            print(f"  Warn: Could not find or construct biography URL: {e}"); champion_data['bio_url'] = ""
+        found_bio_url = self._pick_link(payload.get('bio_links', []), lambda href: '/story/champion/' in href)
+        if found_bio_url:
+            champion_data['bio_url'] = found_bio_url
+        else:
+            clean_name = re.sub(r'[^a-z0-9]', '', champion_data['name'].lower())
+            champion_data['bio_url'] = f"{self.base_url}/en_US/story/champion/{clean_name}/"
+            print(f"  Warn: Could not find bio button/link, constructed fallback URL: {champion_data['bio_url']}")
         champion_data['story_url'] = ""
         return champion_data
 
@@ -197,97 +461,102 @@ class LoLChampionScraper:
 
         return full_text, paragraphs_count
 
-    def extract_bio_and_story(self, champion_data):
-        """Extract full biography from bio_url and find the story_url."""
-        champion_data['full_biography'] = ""
-        if not champion_data.get('bio_url'):
-            print(f"  Info: No biography URL available for {champion_data['name']}")
-            return champion_data
+    def extract_content_payload(self, page, container_selector, paragraph_selector, link_xpath=None):
+        """Joined paragraph text, paragraph count and candidate links of the loaded bio/story page"""
+        started = time.perf_counter()
+        with self.tracer.span('extract', page=page):
+            full_text, paragraphs_count, links = self._extract_content(page, container_selector, paragraph_selector, link_xpath)
+        self._record_extraction_time(page, started)
+        return full_text, paragraphs_count, links
+
+    def _extract_content(self, page, container_selector, paragraph_selector, link_xpath):
+        links = []
+        if self.page is None and self.extraction_mode == 'per_element':
+            full_text, paragraphs_count = self.extract_page_content(container_selector, paragraph_selector)
+            if link_xpath:
+                try:
+                    links = [el.get_attribute('href') or "" for el in self.driver.find_elements(By.XPATH, link_xpath)]
+                except Exception as e:
+                    print(f"  Warn: Error finding links on {page} page: {e}")
+        else:
+            full_text, paragraphs_count = "", 0
+            try:
+                if self.page is not None:
+                    payload = snapshots.content_payload(self.page, container_selector, paragraph_selector, link_xpath)
+                else:
+                    payload = self.driver.execute_script(CONTENT_EXTRACTION_SCRIPT, container_selector, paragraph_selector, link_xpath)
+                paragraphs_count = payload['paragraph_count']
+                full_text = "\n\n".join(payload['paragraphs'])
+                links = payload['links']
+                if not payload['container_found']:
+                    print(f"  Error: Container '{container_selector}' not found in DOM after interaction attempt.")
+                elif not paragraphs_count:
+                    print(f"  Warn: Container '{container_selector}' found, but no paragraphs matched selector '{paragraph_selector}'.")
+                elif not full_text:
+                    print(f"  Warn: Found {paragraphs_count} paragraphs in '{container_selector}', but all textContent was empty after processing.")
+            except Exception as e:
+                print(f"  Error: Exception finding/processing content within '{container_selector}': {type(e).__name__} - {e}")
+        return full_text, paragraphs_count, links
 
-        print(f"Navigating to biography page for {champion_data['name']}...")
-        try:
-            self.driver.get(champion_data['bio_url'])
-            WebDriverWait(self.driver, 15).until(EC.presence_of_element_located((By.CSS_SELECTOR, "body")))
-            time.sleep(1 + random.random())
-        except Exception as nav_e:
-            print(f"  Error navigating to biography URL '{champion_data['bio_url']}': {nav_e}")
-            return champion_data
-        
-        clicked_scroll_button = False
+    def _click_scroll_to_begin(self):
+        """Click the 'Scroll to Begin' button if present so the lazily rendered text is in the DOM"""
         try:
             button_selector = (By.CSS_SELECTOR, "p.cta_VVdh")
-            scroll_button = WebDriverWait(self.driver, 7).until(
-                EC.presence_of_element_located(button_selector)
-            )
+            scroll_button = self._wait(7, EC.presence_of_element_located(button_selector), "scroll_button")
             print("  'Scroll to Begin' button (p.cta_VVdh) is present.")
             try:
                 self.driver.execute_script("arguments[0].scrollIntoView({block: 'center', inline: 'nearest'});", scroll_button)
-                time.sleep(1.0)
-                self.driver.execute_script("arguments[0].click();", scroll_button)
-                print("  Attempted click 'Scroll to Begin' button via JavaScript.")
-                clicked_scroll_button = True
-                print("  Performing small scroll down after click...")
-                self.driver.execute_script("window.scrollBy(0, 150);")
-                time.sleep(0.5)
+                self._sleep(1.0)
+                self.driver.execute_script("arguments[0].click(); window.scrollBy(0, 150);", scroll_button)
+                print("  Clicked 'Scroll to Begin' button via JavaScript and scrolled down.")
+                self._sleep(0.5)
+                return True
             except Exception as js_click_e:
                 print(f"  Warn: JavaScript click execution failed: {type(js_click_e).__name__} - {js_click_e}")
         except TimeoutException:
             print("  Info: 'Scroll to Begin' button (p.cta_VVdh) not found within timeout.")
         except Exception as scroll_e:
             print(f"  Warn: Error interacting with 'Scroll to Begin' button: {type(scroll_e).__name__} - {scroll_e}")
+        return False
 
-        primary_paragraph_selector = "p.p_1_sJ"
-        container_selector = "#CatchElement"
-        bio_text, para_count = self.extract_page_content(container_selector, primary_paragraph_selector)
+    def extract_bio_and_story(self, champion_data):
+        """Extract full biography from bio_url and find the story_url."""
+        champion_data['full_biography'] = ""
+        if not champion_data.get('bio_url'):
+            print(f"  Info: No biography URL available for {champion_data['name']}")
+            return champion_data
+
+        print(f"Navigating to biography page for {champion_data['name']}...")
+        try:
+            self._navigate(champion_data['bio_url'])
+        except Exception as nav_e:
+            print(f"  Error navigating to biography URL '{champion_data['bio_url']}': {nav_e}")
+            self.failed_pages.append('bio')
+            return champion_data
+
+        if self.page is None:
+            self._click_scroll_to_begin()
+            self._store_snapshot()
+        bio_text, para_count, story_links = self.extract_content_payload(
+            'bio', CONTENT_CONTAINER_SELECTOR, CONTENT_PARAGRAPH_SELECTOR, STORY_LINK_XPATH)
         champion_data['full_biography'] = bio_text
 
         if bio_text:
             actual_paragraphs = len(bio_text.split('\n\n'))
             print(f"  Extracted biography text ({actual_paragraphs} non-empty paragraphs joined).")
-        elif not bio_text:
-            print(f"  Warn: Failed to extract biography text content from '{container_selector}'.")
+        else:
+            print(f"  Warn: Failed to extract biography text content from '{CONTENT_CONTAINER_SELECTOR}'.")
+
+        found_story_url = self._pick_link(story_links, lambda href: '/story/' in href and '/story/champion/' not in href)
+        if found_story_url:
+            champion_data['story_url'] = found_story_url
+            print(f"  Found story URL on bio page: {champion_data['story_url']}")
+        else:
+            clean_name = re.sub(r'[^a-z0-9]', '', champion_data['name'].lower())
+            fallback_url = f"{self.base_url}/en_US/story/{clean_name}-color-story/"
+            print(f"  No story link found on bio page. Creating fallback story URL: {fallback_url}")
+            champion_data['story_url'] = fallback_url
 
-        story_button_found = False
-        try:
-            story_links = self.driver.find_elements(By.XPATH, 
-                "//a[.//button[.//span[contains(text(), 'story') or contains(text(), 'Story')]]]|" +
-                "//a[contains(@href,'/story/')][not(contains(@href, '/story/champion/'))]|" +
-                "//a[contains(@href,'-color-story')]"
-            )
-            
-            found_story_url = ""
-            if story_links:
-                for link in story_links:
-                    href = link.get_attribute('href')
-                    if href and ('/story/' in href) and ('/story/champion/' not in href):
-                        found_story_url = href
-                        story_button_found = True
-                        break
-                
-                if not found_story_url and story_links:
-                    found_story_url = story_links[0].get_attribute('href')
-                    story_button_found = True
-            
-            if found_story_url:
-                champion_data['story_url'] = found_story_url
-                print(f"  Found story URL on bio page: {champion_data['story_url']}")
-            else:
-                print(f"  No story link found on bio page.")
-                champion_data['story_url'] = ""
-        except Exception as e:
-            print(f"  Warn: Error finding story link on bio page: {e}")
-            champion_data['story_url'] = ""
-            
-        if not story_button_found and not champion_data['story_url']:
-            try:
-                clean_name = re.sub(r'[^a-z0-9]', '', champion_data['name'].lower())
-                fallback_url = f"{self.base_url}/en_US/story/{clean_name}-color-story/"
-                print(f"  Creating fallback story URL: {fallback_url}")
-                champion_data['story_url'] = fallback_url
-            except Exception as fallback_e:
-                print(f"  Error creating fallback story URL: {fallback_e}")
-                champion_data['story_url'] = ""
-                
         return champion_data
 
     def extract_story_content(self, champion_data):
@@ -299,52 +568,102 @@ class LoLChampionScraper:
 
         print(f"Navigating to story page for {champion_data['name']}...")
         try:
-            self.driver.get(champion_data['story_url'])
-            WebDriverWait(self.driver, 15).until(EC.presence_of_element_located((By.CSS_SELECTOR, "body")))
-            time.sleep(1 + random.random())
+            self._navigate(champion_data['story_url'])
         except Exception as nav_e:
             print(f"  Error navigating to story URL '{champion_data['story_url']}': {nav_e}")
+            self.failed_pages.append('story')
             return champion_data
 
-        clicked_scroll_button = False
-        try:
-            button_selector = (By.CSS_SELECTOR, "p.cta_VVdh")
-            scroll_button = WebDriverWait(self.driver, 7).until(
-                EC.presence_of_element_located(button_selector)
-            )
-            print("  'Scroll to Begin' button (p.cta_VVdh) is present.")
-            try:
-                self.driver.execute_script("arguments[0].scrollIntoView({block: 'center', inline: 'nearest'});", scroll_button)
-                time.sleep(1.0)
-                self.driver.execute_script("arguments[0].click();", scroll_button)
-                print("  Attempted click 'Scroll to Begin' button via JavaScript.")
-                clicked_scroll_button = True
-                print("  Performing small scroll down after click...")
-                self.driver.execute_script("window.scrollBy(0, 150);")
-                time.sleep(0.5)
-            except Exception as js_click_e:
-                print(f"  Warn: JavaScript click execution failed: {type(js_click_e).__name__} - {js_click_e}")
-        except TimeoutException:
-            print("  Info: 'Scroll to Begin' button (p.cta_VVdh) not found within timeout.")
-        except Exception as scroll_e:
-            print(f"  Warn: Error interacting with 'Scroll to Begin' button: {type(scroll_e).__name__} - {scroll_e}")
-
-        primary_paragraph_selector = "p.p_1_sJ"
-        container_selector = "#CatchElement"
-        story_text, para_count = self.extract_page_content(container_selector, primary_paragraph_selector)
+        if self.page is None:
+            self._click_scroll_to_begin()
+            self._store_snapshot()
+        story_text, para_count, _ = self.extract_content_payload(
+            'story', CONTENT_CONTAINER_SELECTOR, CONTENT_PARAGRAPH_SELECTOR)
         champion_data['full_story'] = story_text
 
         if story_text:
             actual_paragraphs = len(story_text.split('\n\n'))
             print(f"  Extracted story text ({actual_paragraphs} non-empty paragraphs joined).")
-        elif not story_text:
-            print(f"  Warn: Failed to extract story text content from '{container_selector}'.")
+        else:
+            print(f"  Warn: Failed to extract story text content from '{CONTENT_CONTAINER_SELECTOR}'.")
 
         return champion_data
 
-    def scrape_champions(self, limit=None):
-        """Scrape information for all champions"""
-        all_data = []
+    def extraction_report(self):
+        """Mean extraction time per page type for the timings collected so far"""
+        report = {}
+        for timing in self.extraction_timings:
+            entry = report.setdefault((timing['page'], timing['mode']), {'pages': 0, 'seconds': 0.0})
+            entry['pages'] += 1
+            entry['seconds'] += timing['seconds']
+        return [
+            {'page': page, 'mode': mode, 'pages': entry['pages'], 'mean_ms': round(entry['seconds'] / entry['pages'] * 1000, 2)}
+            for (page, mode), entry in sorted(report.items())
+        ]
+
+    def scrape_champion(self, champion):
+        """Scrape details, biography and story for a single champion from the list.
+        Pages that could not be loaded are listed in `failed_pages` afterwards."""
+        self.failed_pages = []
+        current_champion_data = {'name': champion['name'], 'url': champion['url'], 'region': champion.get('region','')}
+        with self.tracer.span('champion', champion=champion['name']):
+            with self.tracer.span('details'):
+                current_champion_data = self.extract_champion_details(current_champion_data)
+            with self.tracer.span('bio'):
+                current_champion_data = self.extract_bio_and_story(current_champion_data)
+            with self.tracer.span('story'):
+                current_champion_data = self.extract_story_content(current_champion_data)
+        return current_champion_data
+
+    def _scrape_worker(self, worker_id, task_queue, result_queue, stop_event, spawned):
+        """Pull (index, champion) tasks off the shared queue until it is empty.
+        Spawned scrapers are added to `spawned` so the main thread can quit their browsers if needed."""
+        scraper = None
+        try:
+            scraper = self if worker_id == 0 else self._spawn_worker()
+            if scraper is not self:
+                spawned.append(scraper)
+            while not stop_event.is_set():
+                try:
+                    index, champion = task_queue.get_nowait()
+                except queue.Empty:
+                    break
+                try:
+                    result = scraper.scrape_champion(champion)
+                    result_queue.put((index, result, not scraper.failed_pages))
+                except Exception as e:
+                    print(f"  Error: Worker {worker_id} failed on {champion['name']}: {type(e).__name__} - {e}")
+                    result_queue.put((index, self._unscraped(champion), False))
+        except Exception as e:
+            print(f"  Error: Worker {worker_id} could not start: {type(e).__name__} - {e}")
+        finally:
+            result_queue.put((None, worker_id, False))
+            if scraper is not None and scraper is not self:
+                scraper._quit_driver()
+
+    @staticmethod
+    def _unscraped(champion):
+        """The list-page fields of a champion whose own pages were never scraped"""
+        return {'name': champion['name'], 'url': champion['url'], 'region': champion.get('region', '')}
+
+    def _quit_driver(self):
+        driver, self.driver = self.driver, None
+        if driver is not None:
+            try:
+                driver.quit()
+            except Exception as e:
+                print(f"  Warn: Error quitting WebDriver: {type(e).__name__} - {e}")
+
+    def scrape_champions(self, limit=None, workers=1, checkpoint=None, resume=False):
+        """Scrape information for all champions, optionally with several browser workers.
+
+        Every finished champion is appended to `checkpoint` (a ScrapeCheckpoint). With `resume`,
+        champions already complete in the checkpoint are reused instead of being scraped again;
+        without it the log is reset, so callers must make sure it holds nothing worth keeping."""
+        results = []
+        stop_event = threading.Event()
+        threads = []
+        spawned = []
         try:
             champions_list = self.extract_champions_list()
             if not champions_list:
@@ -353,78 +672,349 @@ class LoLChampionScraper:
             if limit:
                 champions_list = champions_list[:limit]
             self.champions_data = []
+            results = [None] * len(champions_list)
 
-            for champion in tqdm(champions_list, desc="Scraping champions"):
-                time.sleep(1.5 + random.random() * 2)
-                current_champion_data = {'name': champion['name'], 'url': champion['url'], 'region': champion.get('region','')}
-                current_champion_data = self.extract_champion_details(current_champion_data)
-                current_champion_data = self.extract_bio_and_story(current_champion_data)
-                current_champion_data = self.extract_story_content(current_champion_data)
-                all_data.append(current_champion_data)
-                self.champions_data = all_data
-                self.save_to_json(self.champions_data, '../data/progress_champions_data.json') # Pass data
-
-            print(f"\nScraping complete. Processed {len(all_data)} champions.")
-            return all_data
+            completed = {}
+            if checkpoint is not None:
+                if resume:
+                    completed = checkpoint.load()
+                    print(f"Resuming: {len(completed)} champions already complete in {checkpoint.path}")
+                else:
+                    checkpoint.reset()
+            task_queue = queue.Queue()
+            pending = 0
+            for index, champion in enumerate(champions_list):
+                if champion['name'] in completed:
+                    results[index] = completed[champion['name']]
+                else:
+                    task_queue.put((index, champion))
+                    pending += 1
+
+            recorded = incomplete = 0
+
+            def record(index, result, complete):
+                nonlocal recorded, incomplete
+                recorded += 1
+                results[index] = result
+                if not complete:
+                    incomplete += 1
+                    print(f"  Warn: {result['name']} is incomplete and will be retried on --resume")
+                if checkpoint is not None:
+                    with self.tracer.span('checkpoint', champion=result.get('name')):
+                        checkpoint.append(index, result, complete)
+
+            workers = max(1, min(workers, pending))
+            if workers > 1 and not self.rate_limiter:
+                self.rate_limiter = HostRateLimiter(DEFAULT_REQUESTS_PER_SECOND)
+                print(f"Using default rate limit of {DEFAULT_REQUESTS_PER_SECOND} requests/s per host for {workers} workers")
+            result_queue = queue.Queue()
+            started = time.perf_counter()
+
+            if workers == 1:
+                for _ in tqdm(range(pending), desc="Scraping champions"):
+                    index, champion = task_queue.get_nowait()
+                    if not self.rate_limiter and not self.replay:
+                        self._sleep(1.5 + random.random() * 2)
+                    result = self.scrape_champion(champion)
+                    record(index, result, not self.failed_pages)
+            else:
+                threads = [
+                    threading.Thread(target=self._scrape_worker,
+                                     args=(i, task_queue, result_queue, stop_event, spawned), daemon=True)
+                    for i in range(workers)
+                ]
+                for thread in threads:
+                    thread.start()
+                running = workers
+                with tqdm(total=pending, desc=f"Scraping champions ({workers} workers)") as pbar:
+                    while running:
+                        index, result, complete = result_queue.get()
+                        if index is None:
+                            running -= 1
+                            continue
+                        record(index, result, complete)
+                        pbar.update(1)
+                # champions no worker got to (e.g. every browser failed to launch) are logged as incomplete
+                while True:
+                    try:
+                        index, champion = task_queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    record(index, self._unscraped(champion), False)
+
+            elapsed = time.perf_counter() - started
+            self.last_run_stats = {'workers': workers, 'champions': recorded, 'seconds': elapsed}
+            print(f"\nScraping complete. Processed {recorded} champions ({incomplete} incomplete, "
+                  f"{len(champions_list) - pending} reused from checkpoint).")
+            for row in self.extraction_report():
+                print(f"  {row['page']:>8} pages: {row['mean_ms']:.1f} ms mean extraction over {row['pages']} pages ({row['mode']})")
+            self.tracer.print_summary()
         except KeyboardInterrupt:
+            stop_event.set()
             print("\nScraping interrupted by user.")
-            return all_data
         except Exception as e:
+            stop_event.set()
             print(f"\nAn critical error occurred during scraping: {type(e).__name__} - {e}")
             traceback.print_exc()
-            return all_data
         finally:
-            print("Closing WebDriver...")
-            if hasattr(self, 'driver'):
-                self.driver.quit()
-
-    def save_to_csv(self, data_to_save, filename='../data/lol_champions_data.csv'):
-        """Save the collected data to a CSV file"""
+            # let workers finish their current champion (worker 0 drives self.driver) before closing browsers
+            stop_event.set()
+            deadline = time.monotonic() + WORKER_SHUTDOWN_TIMEOUT
+            for thread in threads:
+                thread.join(max(0.0, deadline - time.monotonic()))
+            if any(thread.is_alive() for thread in threads):
+                print(f"  Warn: Workers still busy after {WORKER_SHUTDOWN_TIMEOUT}s; closing their browsers anyway")
+            for worker in spawned:
+                worker._quit_driver()
+            self.champions_data = [r for r in results if r is not None]
+            if checkpoint is not None:
+                checkpoint.close()
+            self.tracer.flush()
+            if self.driver:
+                print("Closing WebDriver...")
+                self._quit_driver()
+        return self.champions_data
+
+    @staticmethod
+    def save_to_parquet(data_to_save, filename='../data/lol_champions_data.parquet'):
+        """Save the collected data to the canonical champion store, keeping related_champions as a list"""
         if not data_to_save:
-            print("No champion data provided to save to CSV.")
+            print("No champion data provided to save to parquet.")
             return
         try:
-            df = pd.DataFrame(data_to_save)
-            cols = ['name', 'region', 'role', 'race', 'quote', 'related_champions',
-                    'short_bio', 'full_biography', 'full_story', 'url', 'bio_url', 'story_url']
-            if 'related_champions' in df.columns:
-                df['related_champions'] = df['related_champions'].apply(lambda x: ', '.join(x) if isinstance(x, list) else x)
-            df = df.reindex(columns=[col for col in cols if col in df.columns])
-            df.to_csv(filename, index=False, encoding='utf-8')
-            print(f"Data saved to {filename}")
-        except Exception as e:
-            print(f"Error saving data to CSV {filename}: {e}")
-
-    def save_to_json(self, data_to_save, filename='../data/lol_champions_data.json'):
-        """Save the collected data to a JSON file"""
-        try:
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(data_to_save, f, ensure_ascii=False, indent=4)
-            if 'progress' not in filename: print(f"Data saved to {filename}")
-            else: pass
+            champion_store.write_champions(data_to_save, filename)
         except Exception as e:
-            print(f"Error saving data to JSON {filename}: {e}")
-
-def main():
-    scraper = LoLChampionScraper()
-    final_champion_data = None
+            print(f"Error saving data to parquet {filename}: {e}")
+
+    @classmethod
+    def save_outputs(cls, data_to_save, prefix='../data/lol_champions_data', exports=()):
+        """Write the parquet champion store, plus any requested `exports` ('csv', 'json') generated from it"""
+        cls.save_to_parquet(data_to_save, f"{prefix}.parquet")
+        if exports and data_to_save:
+            champion_store.export(f"{prefix}.parquet", exports, prefix)
+
+class ScrapeCheckpoint:
+    """Append-only JSON-lines log with one line per scraped champion, fsync'd after every append.
+    Champions whose pages failed to load are logged as incomplete, so --resume scrapes them again."""
+    def __init__(self, path='../data/scrape_checkpoint.jsonl'):
+        self.path = path
+        self.file = None
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def _is_complete(entry):
+        # entries logged before the flag existed count as complete only if some lore text was scraped
+        champion = entry['champion']
+        return entry.get('complete', bool(champion.get('full_biography') or champion.get('full_story')))
+
+    def _entries(self):
+        """Latest log entry per champion name; a torn last line left by a crash is skipped"""
+        entries = {}
+        if not os.path.exists(self.path):
+            return entries
+        with open(self.path, encoding='utf-8') as f:
+            for line_number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    print(f"  Warn: Skipping unreadable checkpoint line {line_number} in {self.path}")
+                    continue
+                entries[entry['champion']['name']] = entry
+        return entries
+
+    def load(self):
+        """Return {champion name: data} for every complete champion in the log; incomplete ones get retried"""
+        return {name: entry['champion'] for name, entry in self._entries().items() if self._is_complete(entry)}
+
+    def load_ordered(self):
+        """Return the logged champions (complete or partial) in roster order"""
+        return [entry['champion'] for entry in sorted(self._entries().values(), key=lambda e: e['index'])]
+
+    def _open(self):
+        if self.file is None:
+            needs_newline = os.path.exists(self.path) and os.path.getsize(self.path) > 0
+            if needs_newline:
+                with open(self.path, 'rb') as f:
+                    f.seek(-1, os.SEEK_END)
+                    needs_newline = f.read(1) != b'\n'
+            self.file = open(self.path, 'a', encoding='utf-8')
+            if needs_newline:
+                self.file.write('\n')
+        return self.file
+
+    def append(self, index, champion_data, complete=True):
+        """Durably record one finished champion, its position in the roster and whether all its pages loaded"""
+        line = json.dumps({'index': index, 'champion': champion_data, 'complete': complete}, ensure_ascii=False)
+        with self.lock:
+            f = self._open()
+            f.write(line + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    def reset(self):
+        """Start a fresh log, discarding any previous run"""
+        with self.lock:
+            self.close()
+            open(self.path, 'w', encoding='utf-8').close()
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def compact(self, prefix='../data/lol_champions_data', exports=()):
+        """Read the log once and write the champion store (and any exports) from it"""
+        data = self.load_ordered()
+        print(f"Compacting {len(data)} champions from {self.path}")
+        LoLChampionScraper.save_outputs(data, prefix, exports)
+        return data
+
+class SavedPageHandler(BaseHTTPRequestHandler):
+    """Serve saved pages from the server's directory, pointing live-site links at the local server"""
+    def do_GET(self):
+        root = os.path.abspath(self.server.directory)
+        path = os.path.abspath(os.path.join(root, unquote(urlparse(self.path).path).lstrip('/')))
+        if os.path.isdir(path):
+            path = os.path.join(path, 'index.html')
+        if not path.startswith(root) or not os.path.isfile(path):
+            self.send_error(404)
+            return
+        with open(path, 'rb') as f:
+            body = f.read()
+        content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        if content_type == 'text/html':
+            body = body.replace(self.server.live_base_url.encode(), self.server.base_url.encode())
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_local_server(directory, port=0, live_base_url=LIVE_BASE_URL):
+    """Serve a directory of saved pages (en_US/champions/index.html, ...) in a background thread.
+    Returns the server and the base URL to hand to LoLChampionScraper."""
+    server = ThreadingHTTPServer(('127.0.0.1', port), SavedPageHandler)
+    server.directory = directory
+    server.live_base_url = live_base_url
+    server.base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Serving saved pages from {directory} at {server.base_url}")
+    return server, server.base_url
+
+def benchmark_workers(base_url, worker_counts=(1, 2, 4, 8), limit=None, requests_per_second=50.0, headless=True):
+    """Scrape the same roster with different worker counts and report champions per minute"""
+    report = []
+    for workers in worker_counts:
+        scraper = LoLChampionScraper(base_url=base_url, headless=headless, rate_limiter=HostRateLimiter(requests_per_second))
+        data = scraper.scrape_champions(limit=limit, workers=workers)
+        seconds = scraper.last_run_stats.get('seconds', 0.0)
+        per_minute = len(data) / seconds * 60 if seconds else 0.0
+        report.append({'workers': workers, 'champions': len(data), 'seconds': round(seconds, 2), 'champions_per_minute': round(per_minute, 2)})
+    print("\n=== Scraper worker benchmark ===")
+    print(f"{'workers':>8} {'champions':>10} {'seconds':>10} {'champs/min':>11}")
+    for row in report:
+        print(f"{row['workers']:>8} {row['champions']:>10} {row['seconds']:>10} {row['champions_per_minute']:>11}")
+    return report
+
+def benchmark_extraction(base_url, limit=None, requests_per_second=50.0, headless=True):
+    """Scrape the same pages with per-element and batched extraction and compare mean per-page times"""
+    reports = {}
+    for mode in ('per_element', 'batched'):
+        scraper = LoLChampionScraper(base_url=base_url, headless=headless,
+                                     rate_limiter=HostRateLimiter(requests_per_second), extraction_mode=mode)
+        scraper.scrape_champions(limit=limit)
+        reports[mode] = {row['page']: row['mean_ms'] for row in scraper.extraction_report()}
+    print("\n=== Per-page extraction time (ms) ===")
+    print(f"{'page':>8} {'per_element':>12} {'batched':>9} {'speedup':>8}")
+    for page in ('details', 'bio', 'story'):
+        before = reports['per_element'].get(page)
+        after = reports['batched'].get(page)
+        if before is None or after is None:
+            continue
+        speedup = before / after if after else float('inf')
+        print(f"{page:>8} {before:>12.1f} {after:>9.1f} {speedup:>7.1f}x")
+    return reports
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Scrape champion lore from Universe of League of Legends")
+    parser.add_argument('--workers', type=int, default=1, help="number of concurrent browser workers")
+    parser.add_argument('--rps', type=float, default=None, help="requests per second per host; replaces the fixed sleeps")
+    parser.add_argument('--limit', type=int, default=None, help="only scrape the first N champions")
+    parser.add_argument('--headless', action='store_true', help="run Chrome headless")
+    parser.add_argument('--base-url', default=LIVE_BASE_URL, help="site to scrape (e.g. a local server of saved pages)")
+    parser.add_argument('--serve', metavar='DIR', default=None, help="serve saved pages from DIR locally and scrape those")
+    parser.add_argument('--benchmark', action='store_true', help="report champions/minute for 1, 2, 4 and 8 workers")
+    parser.add_argument('--extraction-mode', choices=['batched', 'per_element'], default='batched',
+                        help="one injected script per page, or one WebDriver call per element")
+    parser.add_argument('--benchmark-extraction', action='store_true', help="compare per-page extraction time of both modes")
+    parser.add_argument('--checkpoint', default='../data/scrape_checkpoint.jsonl', help="append-only log of finished champions")
+    parser.add_argument('--resume', action='store_true', help="skip champions already complete in the checkpoint log")
+    parser.add_argument('--fresh', action='store_true',
+                        help="discard a checkpoint log that still holds complete champions and start over")
+    parser.add_argument('--compact', action='store_true', help="only rebuild the final outputs from the checkpoint log")
+    parser.add_argument('--snapshots', metavar='DIR', default=None, help="store rendered HTML of every visited page in DIR")
+    parser.add_argument('--max-snapshot-age', type=float, default=None,
+                        help="hours a snapshot stays fresh; fresh pages are parsed from the cache instead of re-fetched")
+    parser.add_argument('--replay', action='store_true',
+                        help="re-extract everything from --snapshots without a browser (never touches --checkpoint)")
+    parser.add_argument('--export', default='', help="also export the champion store as these formats, e.g. csv,json")
+    parser.add_argument('--trace', default='../data/scrape_trace.jsonl', help="JSON-lines file of timed spans per stage")
+    parser.add_argument('--no-trace', action='store_true', help="disable span tracing entirely")
+    parser.add_argument('--export-site', metavar='DIR', default=None, help="write --snapshots out as a directory for --serve")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    checkpoint = ScrapeCheckpoint(args.checkpoint)
+    if args.compact:
+        checkpoint.compact(exports=champion_store.parse_export_formats(args.export))
+        return
+    snapshot_cache = SnapshotCache(args.snapshots) if args.snapshots else None
+    if args.export_site:
+        if snapshot_cache is None:
+            raise SystemExit("--export-site needs --snapshots")
+        snapshot_cache.export_site(args.export_site, live_base_url=args.base_url)
+        return
+    base_url = args.base_url
+    if args.serve:
+        _, base_url = start_local_server(args.serve)
+    if args.benchmark:
+        benchmark_workers(base_url, limit=args.limit, requests_per_second=args.rps or 50.0, headless=True)
+        return
+    if args.benchmark_extraction:
+        benchmark_extraction(base_url, limit=args.limit, requests_per_second=args.rps or 50.0, headless=True)
+        return
+
+    if args.replay:
+        # replays are re-run freely while tuning selectors; they must not clobber a live crawl's resume log
+        checkpoint = None
+    elif not args.resume and not args.fresh and checkpoint.load():
+        raise SystemExit(f"{args.checkpoint} holds complete champions from an earlier run; "
+                         "pass --resume to continue it or --fresh to discard it")
+    rate_limiter = HostRateLimiter(args.rps) if args.rps else None
+    max_snapshot_age = args.max_snapshot_age * 3600 if args.max_snapshot_age is not None else None
+    tracer = Tracer(args.trace, enabled=not args.no_trace)
+    scraper = LoLChampionScraper(base_url=base_url, headless=args.headless, rate_limiter=rate_limiter,
+                                 extraction_mode=args.extraction_mode, snapshot_cache=snapshot_cache,
+                                 max_snapshot_age=max_snapshot_age, replay=args.replay, tracer=tracer)
     try:
-        final_champion_data = scraper.scrape_champions()
+        scraper.scrape_champions(limit=args.limit, workers=args.workers, checkpoint=checkpoint, resume=args.resume)
     finally:
-        if final_champion_data:
+        if scraper.champions_data:
             print("\nSaving final data...")
-            scraper.save_to_csv(final_champion_data, '../data/lol_champions_data.csv')
-            scraper.save_to_json(final_champion_data, '../data/lol_champions_data.json')
+            with tracer.span('save'):
+                scraper.save_outputs(scraper.champions_data, exports=champion_store.parse_export_formats(args.export))
+            tracer.flush()
         else:
-            if scraper.champions_data:
-                print("\nScraping did not complete fully, saving data collected so far...")
-                scraper.save_to_csv(scraper.champions_data, '../data/lol_champions_data.csv')
-                scraper.save_to_json(scraper.champions_data, '../data/lol_champions_data.json')
-            else:
-                print("\nNo final data collected to save.")
-        if hasattr(scraper, 'driver') and scraper.driver:
+            print("\nNo final data collected to save.")
+        if scraper.driver:
             scraper.driver.quit()
             print("WebDriver quit confirmed from main.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
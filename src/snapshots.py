@@ -0,0 +1,187 @@
+import os
+import gzip
+import json
+import time
+import hashlib
+import threading
+from urllib.parse import urlparse
+import lxml.html
+from lxml.cssselect import CSSSelector
+
+
+class SnapshotCache:
+    """Content-addressed store of rendered page HTML.
+
+    Each snapshot is gzip-compressed under objects/<sha256[:2]>/<sha256>.html.gz, so pages that
+    render identically are stored once. The index maps every visited URL to its current hash and
+    fetch time, which is what the scraper uses to decide whether a page needs re-fetching. Puts
+    append one line to index.jsonl (last entry per URL wins); opening the cache folds that log
+    into index.json, so the full index is rewritten once per run rather than once per page."""
+    def __init__(self, root='../data/snapshots'):
+        self.root = root
+        self.index_path = os.path.join(root, 'index.json')
+        self.log_path = os.path.join(root, 'index.jsonl')
+        self.lock = threading.Lock()
+        os.makedirs(os.path.join(root, 'objects'), exist_ok=True)
+        self.index = {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path, encoding='utf-8') as f:
+                self.index = json.load(f)
+        if os.path.exists(self.log_path):
+            self._replay_log()
+            self._compact()
+
+    def _replay_log(self):
+        with open(self.log_path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # a line cut short by a crash mid-append
+                self.index[entry.pop('url')] = entry
+
+    def _compact(self):
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.index, f, ensure_ascii=False)
+        os.replace(tmp_path, self.index_path)
+        os.remove(self.log_path)
+
+    def _object_path(self, digest):
+        return os.path.join(self.root, 'objects', digest[:2], f"{digest}.html.gz")
+
+    def put(self, url, html):
+        """Store the rendered HTML for `url` and return its content hash"""
+        data = html.encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._object_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with gzip.open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        entry = {'sha256': digest, 'fetched_at': time.time(), 'bytes': len(data)}
+        with self.lock:
+            self.index[url] = entry
+            with open(self.log_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps({'url': url, **entry}, ensure_ascii=False) + '\n')
+        return digest
+
+    def get(self, url):
+        """Rendered HTML for `url`, or None if it was never snapshotted"""
+        entry = self.index.get(url)
+        if entry is None:
+            return None
+        with gzip.open(self._object_path(entry['sha256']), 'rb') as f:
+            return f.read().decode('utf-8')
+
+    def age(self, url):
+        """Seconds since `url` was last fetched, or None if it was never snapshotted"""
+        entry = self.index.get(url)
+        return time.time() - entry['fetched_at'] if entry else None
+
+    def is_fresh(self, url, max_age):
+        """True if a snapshot exists and is younger than `max_age` seconds (None means never fresh)"""
+        age = self.age(url)
+        return age is not None and max_age is not None and age <= max_age
+
+    def export_site(self, directory, live_base_url=None):
+        """Write every snapshot to `directory` laid out by URL path (en_US/champions/index.html, ...),
+        ready to be served by scraper.start_local_server"""
+        count = 0
+        for url in self.index:
+            parsed = urlparse(url)
+            if live_base_url and not url.startswith(live_base_url):
+                continue
+            path = os.path.join(directory, parsed.path.lstrip('/'), 'index.html')
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(self.get(url))
+            count += 1
+        print(f"Exported {count} snapshots to {directory}")
+        return count
+
+
+_selector_cache = {}
+
+def _select(doc, selector):
+    compiled = _selector_cache.get(selector)
+    if compiled is None:
+        compiled = _selector_cache[selector] = CSSSelector(selector)
+    return compiled(doc)
+
+def _first(doc, selector):
+    found = _select(doc, selector)
+    return found[0] if found else None
+
+def _visible_text(element):
+    """Approximation of innerText: text per line, with runs of spaces collapsed"""
+    if element is None:
+        return ""
+    lines = (' '.join(line.split()) for line in element.text_content().split('\n'))
+    return '\n'.join(line for line in lines if line).strip()
+
+def _link_hrefs(doc, xpath):
+    if not xpath:
+        return []
+    return [link.get('href') or "" for link in doc.xpath(xpath)]
+
+def parse_html(html, url):
+    """Parse a snapshot with lxml, resolving relative links against the page URL as a browser would"""
+    doc = lxml.html.fromstring(html, base_url=url)
+    doc.make_links_absolute(url, resolve_base_href=True)
+    return doc
+
+def champions_list_payload(doc, selectors, base_url):
+    """Champion name/region/url entries from a parsed champions list page, trying `selectors` in order"""
+    for selector in selectors:
+        champions = []
+        for element in _select(doc, selector):
+            url = element.get('href')
+            if not url or not url.startswith(base_url):
+                continue
+            name = _visible_text(_first(element, 'h1'))
+            region = _visible_text(_first(element, 'h2'))
+            if name and not any(c['name'] == name.upper() for c in champions):
+                champions.append({'name': name.upper(), 'region': region, 'url': url})
+        if champions:
+            return selector, champions
+    return None, []
+
+def details_payload(doc, role_selector, race_selector, quote_selector, bio_paragraph_selector,
+                    bio_container_selector, related_selector, bio_link_xpath):
+    """Parser counterpart of scraper.DETAILS_EXTRACTION_SCRIPT"""
+    short_bio = _visible_text(_first(doc, bio_paragraph_selector))
+    short_bio_selector = 'paragraph'
+    if not short_bio:
+        short_bio_selector = 'container'
+        container_text = _visible_text(_first(doc, bio_container_selector))
+        paragraphs = [p.strip() for p in container_text.split('\n') if p.strip()]
+        short_bio = paragraphs[0] if paragraphs else container_text
+    related = []
+    for h5 in _select(doc, related_selector):
+        name = h5.text_content().strip()
+        if name and name not in related:
+            related.append(name)
+    return {
+        'role': _visible_text(_first(doc, role_selector)),
+        'race': _visible_text(_first(doc, race_selector)),
+        'quote': _visible_text(_first(doc, quote_selector)),
+        'short_bio': short_bio,
+        'short_bio_selector': short_bio_selector,
+        'related_champions': related,
+        'bio_links': _link_hrefs(doc, bio_link_xpath),
+    }
+
+def content_payload(doc, container_selector, paragraph_selector, link_xpath=None):
+    """Parser counterpart of scraper.CONTENT_EXTRACTION_SCRIPT"""
+    container = _first(doc, container_selector)
+    paragraphs = _select(container, paragraph_selector) if container is not None else []
+    texts = [p.text_content().strip() for p in paragraphs]
+    return {
+        'container_found': container is not None,
+        'paragraph_count': len(paragraphs),
+        'paragraphs': [t for t in texts if t],
+        'links': _link_hrefs(doc, link_xpath),
+    }
@@ -0,0 +1,196 @@
+import os
+import time
+import resource
+import argparse
+import multiprocessing
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+import torch
+from datasets import load_from_disk
+from transformers import (AutoTokenizer, AutoModelForCausalLM, TrainingArguments, Trainer, TrainerCallback,
+                          default_data_collator)
+from peft import LoraConfig, PeftModel, get_peft_model
+from preprocess import build_training_dataset, load_sharded_dataset
+from generation import BASE_MODEL_ID, TINY_TOKENIZER_CORPUS, build_tiny_tokenizer, build_tiny_gpt2
+
+# GPT-2's attention (c_attn, c_proj) and MLP (c_fc, c_proj) projections are all Conv1D layers
+LORA_TARGET_MODULES = ["c_attn", "c_proj", "c_fc"]
+
+# Micro-batch/accumulation per mode, both an effective batch of 8 sequences like the notebook's full fine-tune
+MODE_DEFAULTS = {
+    "full": {"micro_batch_size": 1, "grad_accum": 8, "learning_rate": 5e-5},
+    "lora": {"micro_batch_size": 8, "grad_accum": 1, "learning_rate": 2e-4},
+}
+
+
+def peak_memory_bytes(device):
+    """Peak CUDA allocation on GPU; on CPU the process's peak resident set size, which never goes down,
+    so CPU runs to be compared must each get their own process (see compare_modes_tiny)"""
+    if str(device).startswith("cuda"):
+        return torch.cuda.max_memory_allocated()
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+class TrainingStatsCallback(TrainerCallback):
+    """Measures training throughput (non-padding tokens/s) and peak memory of one trainer.train() call"""
+    def __init__(self, tokens_per_epoch):
+        self.tokens_per_epoch = tokens_per_epoch
+        self.stats = {}
+
+    def on_train_begin(self, args, state, control, **kwargs):
+        if torch.cuda.is_available():
+            torch.cuda.reset_peak_memory_stats()
+        self.started = time.perf_counter()
+
+    def on_train_end(self, args, state, control, model=None, **kwargs):
+        seconds = time.perf_counter() - self.started
+        epochs = state.epoch or args.num_train_epochs
+        tokens = self.tokens_per_epoch * epochs
+        self.stats = {
+            "steps": state.global_step,
+            "seconds": round(seconds, 2),
+            "tokens_per_second": round(tokens / seconds, 1) if seconds else 0.0,
+            "peak_memory_mb": round(peak_memory_bytes(args.device) / 2**20, 1),
+        }
+        if model is not None:
+            trainable = sum(p.numel() for p in model.parameters() if p.requires_grad)
+            self.stats["trainable_params"] = trainable
+            self.stats["total_params"] = sum(p.numel() for p in model.parameters())
+        print(f"Training stats: {self.stats}")
+
+def prepare_model(model, mode="lora", gradient_checkpointing=False, lora_r=16, lora_alpha=32, lora_dropout=0.05):
+    """Wrap `model` with LoRA adapters (mode 'lora') and/or enable gradient checkpointing"""
+    if gradient_checkpointing:
+        model.config.use_cache = False
+        model.gradient_checkpointing_enable(gradient_checkpointing_kwargs={"use_reentrant": False})
+    if mode == "full":
+        return model
+    if mode != "lora":
+        raise ValueError(f"mode must be 'full' or 'lora', got {mode!r}")
+    if gradient_checkpointing:
+        # the frozen embeddings produce no grad, which checkpointed blocks need as input
+        model.enable_input_require_grads()
+    config = LoraConfig(task_type="CAUSAL_LM", r=lora_r, lora_alpha=lora_alpha, lora_dropout=lora_dropout,
+                        target_modules=LORA_TARGET_MODULES, fan_in_fan_out=True)
+    model = get_peft_model(model, config)
+    model.print_trainable_parameters()
+    return model
+
+def train(model, tokenizer, dataset, output_dir="/checkpoints", mode="lora", gradient_checkpointing=False,
+          micro_batch_size=None, grad_accum=None, learning_rate=None, num_train_epochs=3, max_steps=-1,
+          bf16=None, save_strategy="epoch", logging_steps=50, use_cpu=False):
+    """Fine-tune `model` on a packed dataset and save the result to `{output_dir}/final`.
+
+    In 'lora' mode only the adapter weights (a few MB) are saved; merge them into the base model
+    with merge_adapter() for inference. Returns the TrainingStatsCallback stats."""
+    defaults = MODE_DEFAULTS[mode]
+    model = prepare_model(model, mode, gradient_checkpointing)
+    stats = TrainingStatsCallback(int(torch.as_tensor(dataset["attention_mask"]).sum()))
+    args = TrainingArguments(
+        output_dir=output_dir,
+        per_device_train_batch_size=micro_batch_size or defaults["micro_batch_size"],
+        gradient_accumulation_steps=grad_accum or defaults["grad_accum"],
+        num_train_epochs=num_train_epochs,
+        max_steps=max_steps,
+        learning_rate=learning_rate or defaults["learning_rate"],
+        bf16=torch.cuda.is_available() if bf16 is None else bf16,
+        logging_steps=logging_steps,
+        save_strategy=save_strategy,
+        report_to=[],
+        use_cpu=use_cpu,
+    )
+    print(f"Training ({mode}) with dataset: {dataset}")
+    # labels are explicit in the packed dataset, so no DataCollatorForLanguageModeling (see pack_documents)
+    trainer = Trainer(model=model, args=args, train_dataset=dataset, data_collator=default_data_collator,
+                      callbacks=[stats])
+    trainer.train()
+    final_dir = os.path.join(output_dir, "final")
+    trainer.save_model(final_dir)
+    tokenizer.save_pretrained(final_dir)
+    print(f"Fine-tune complete. {'Adapter' if mode == 'lora' else 'Model'} saved to {final_dir}")
+    return stats.stats
+
+def merge_adapter(base_model, adapter_dir, output_dir, tokenizer=None):
+    """Fold LoRA adapters into the base weights and save a plain checkpoint GenerationService can load"""
+    if isinstance(base_model, (str, Path)):
+        base_model = AutoModelForCausalLM.from_pretrained(base_model)
+    merged = PeftModel.from_pretrained(base_model, adapter_dir).merge_and_unload()
+    merged.save_pretrained(output_dir)
+    (tokenizer or AutoTokenizer.from_pretrained(adapter_dir)).save_pretrained(output_dir)
+    print(f"Merged {adapter_dir} into the base model -> {output_dir}")
+    return merged
+
+def _tiny_dataset(block_size):
+    tokenizer = build_tiny_tokenizer()
+    return tokenizer, build_training_dataset(TINY_TOKENIZER_CORPUS * 64, tokenizer, block_size=block_size)
+
+def _train_tiny(output_dir, mode, gradient_checkpointing, steps, block_size):
+    tokenizer, dataset = _tiny_dataset(block_size)
+    model = build_tiny_gpt2(tokenizer, n_positions=block_size)
+    return train(model, tokenizer, dataset, output_dir, mode, gradient_checkpointing, max_steps=steps,
+                 save_strategy="no", logging_steps=steps, use_cpu=True)
+
+def compare_modes_tiny(output_dir="../models/tiny-lora-check", steps=8, block_size=128):
+    """CPU end-to-end check on a tiny GPT-2: full fine-tune vs LoRA vs LoRA + gradient checkpointing,
+    then merge the LoRA adapter and check the merged model matches the adapted one.
+
+    Each mode trains in a fresh spawned process, so its peak RSS is its own and not the
+    high-water mark left by the modes before it."""
+    results = {}
+    context = multiprocessing.get_context("spawn")
+    for name, mode, checkpointing in (("full", "full", False), ("lora", "lora", False),
+                                      ("lora+checkpointing", "lora", True)):
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            results[name] = pool.submit(_train_tiny, os.path.join(output_dir, name.replace("+", "_")), mode,
+                                        checkpointing, steps, block_size).result()
+
+    tokenizer, dataset = _tiny_dataset(block_size)
+
+    adapter_dir = os.path.join(output_dir, "lora", "final")
+    merged = merge_adapter(build_tiny_gpt2(tokenizer, n_positions=block_size), adapter_dir,
+                           os.path.join(output_dir, "merged"), tokenizer).eval()
+    adapted = PeftModel.from_pretrained(build_tiny_gpt2(tokenizer, n_positions=block_size), adapter_dir).eval()
+    sample = dataset[0]["input_ids"][None]
+    with torch.inference_mode():
+        max_diff = (merged(sample).logits - adapted(sample).logits).abs().max().item()
+    print(f"\nMerged vs adapter logits max |diff|: {max_diff:.2e}")
+
+    print(f"\n{'mode':>20} {'tokens/s':>10} {'peak MB':>9} {'trainable':>10}")
+    for name, stats in results.items():
+        print(f"{name:>20} {stats['tokens_per_second']:>10.1f} {stats['peak_memory_mb']:>9.1f} "
+              f"{stats['trainable_params']:>10}")
+    return results
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Fine-tune GPT-2 on the packed champion dataset (full or LoRA)")
+    parser.add_argument("--mode", choices=["full", "lora"], default="lora")
+    parser.add_argument("--model", default=BASE_MODEL_ID)
+    parser.add_argument("--dataset", default="/data/tokenized_ds",
+                        help="save_to_disk dataset dir, or a sharded one with manifest.json (e.g. /data/tokenized_shards)")
+    parser.add_argument("--output", default="/checkpoints")
+    parser.add_argument("--gradient-checkpointing", action="store_true")
+    parser.add_argument("--micro-batch-size", type=int, default=None, help="defaults to 1 (full) / 8 (lora)")
+    parser.add_argument("--grad-accum", type=int, default=None, help="defaults to 8 (full) / 1 (lora)")
+    parser.add_argument("--epochs", type=float, default=3)
+    parser.add_argument("--merge", metavar="ADAPTER_DIR", default=None,
+                        help="merge this adapter into --model, writing to --output, instead of training")
+    parser.add_argument("--tiny", action="store_true", help="compare full/LoRA training on a tiny GPT-2 on CPU")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.tiny:
+        compare_modes_tiny()
+        return
+    if args.merge:
+        merge_adapter(args.model, args.merge, args.output)
+        return
+    dataset_dir = Path(args.dataset)
+    dataset = load_sharded_dataset(dataset_dir) if (dataset_dir / "manifest.json").exists() else load_from_disk(args.dataset)
+    tokenizer = AutoTokenizer.from_pretrained(args.model)
+    tokenizer.pad_token = tokenizer.eos_token
+    model = AutoModelForCausalLM.from_pretrained(args.model)
+    train(model, tokenizer, dataset, args.output, args.mode, args.gradient_checkpointing, args.micro_batch_size,
+          args.grad_accum, num_train_epochs=args.epochs)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import re
+import pytest
+
+pytest.importorskip("lxml.cssselect")
+scraper = pytest.importorskip("scraper")
+
+import snapshots
+
+BASE_URL = scraper.LIVE_BASE_URL
+DETAILS_SELECTORS = (scraper.ROLE_SELECTOR, scraper.RACE_SELECTOR, scraper.QUOTE_SELECTOR,
+                     scraper.SHORT_BIO_PARAGRAPH_SELECTOR, scraper.SHORT_BIO_CONTAINER_SELECTOR,
+                     scraper.RELATED_CHAMPION_SELECTOR, scraper.BIO_LINK_XPATH)
+
+
+def _script_keys(script):
+    """Keys of the object literal an extraction script returns"""
+    return set(re.findall(r"^\s*(\w+):", script[script.rindex("return {"):], re.MULTILINE))
+
+def _details_page(short_bio_html):
+    # same markup as benchmark.fixture_pages
+    return f"""<html><body>
+<div class="typeDescription_ixWu"><h6>Mage</h6></div><div class="ChampionRace_a_Fp"><h6>Vastaya</h6></div>
+<div class="quote_2507"><p>Trust me.</p></div>{short_bio_html}
+<ul class="champions_jmhN"><li class="champion_1xlO"><h5>Wukong</h5></li><li class="champion_1xlO"><h5>Wukong</h5></li>
+<li class="champion_1xlO"><h5>Sylas</h5></li></ul>
+<a href="/en_US/story/champion/ahri/"><button><span>Read Biography</span></button></a></body></html>"""
+
+def _details(short_bio_html):
+    url = f"{BASE_URL}/en_US/champion/ahri/"
+    return snapshots.details_payload(snapshots.parse_html(_details_page(short_bio_html), url), *DETAILS_SELECTORS)
+
+def test_details_payload_matches_extraction_script():
+    payload = _details('<div class="biographyText_3-to"><p>Innately connected to magic.</p></div>')
+    assert set(payload) == _script_keys(scraper.DETAILS_EXTRACTION_SCRIPT)
+    assert payload["role"] == "Mage"
+    assert payload["race"] == "Vastaya"
+    assert payload["quote"] == "Trust me."
+    assert payload["short_bio"] == "Innately connected to magic."
+    assert payload["short_bio_selector"] == "paragraph"
+    assert payload["related_champions"] == ["Wukong", "Sylas"]
+    assert payload["bio_links"] == [f"{BASE_URL}/en_US/story/champion/ahri/"]
+
+def test_short_bio_falls_back_to_first_line_of_container():
+    payload = _details('<div class="biographyText_3-to"><div>Innately connected to magic.</div>\n'
+                       '<div>Second line.</div></div>')
+    assert payload["short_bio"] == "Innately connected to magic."
+    assert payload["short_bio_selector"] == "container"
+
+def test_content_payload_matches_extraction_script():
+    url = f"{BASE_URL}/en_US/story/champion/ahri/"
+    page_html = ('<html><body><div id="CatchElement"><p class="p_1_sJ">First.</p><p class="p_1_sJ"> </p>'
+                 '<p class="p_1_sJ">Second.</p></div></body></html>')
+    payload = snapshots.content_payload(snapshots.parse_html(page_html, url), scraper.CONTENT_CONTAINER_SELECTOR,
+                                        scraper.CONTENT_PARAGRAPH_SELECTOR, scraper.STORY_LINK_XPATH)
+    assert set(payload) == _script_keys(scraper.CONTENT_EXTRACTION_SCRIPT)
+    assert payload["container_found"]
+    assert payload["paragraph_count"] == 3
+    assert payload["paragraphs"] == ["First.", "Second."]
+    assert payload["links"] == []
+
+def test_missing_content_container():
+    url = f"{BASE_URL}/en_US/story/ahri-color-story/"
+    payload = snapshots.content_payload(snapshots.parse_html("<html><body></body></html>", url),
+                                        scraper.CONTENT_CONTAINER_SELECTOR, scraper.CONTENT_PARAGRAPH_SELECTOR)
+    assert payload == {"container_found": False, "paragraph_count": 0, "paragraphs": [], "links": []}
+
+def test_story_link_prefers_story_over_biography_links():
+    url = f"{BASE_URL}/en_US/story/champion/ahri/"
+    page_html = ('<html><body><div id="CatchElement"><p class="p_1_sJ">Bio.</p></div>'
+                 '<a href="/en_US/story/champion/ahri/"><button><span>Story</span></button></a>'
+                 '<a href="/en_US/story/ahri-color-story/">Read the story</a></body></html>')
+    payload = snapshots.content_payload(snapshots.parse_html(page_html, url), scraper.CONTENT_CONTAINER_SELECTOR,
+                                        scraper.CONTENT_PARAGRAPH_SELECTOR, scraper.STORY_LINK_XPATH)
+    assert payload["links"][0] == f"{BASE_URL}/en_US/story/champion/ahri/"
+    is_story = lambda href: '/story/' in href and '/story/champion/' not in href
+    assert scraper.LoLChampionScraper._pick_link(payload["links"], is_story) == f"{BASE_URL}/en_US/story/ahri-color-story/"
+    # with no preferred link, the first one found is used, as the original XPath fallbacks did
+    assert scraper.LoLChampionScraper._pick_link(payload["links"][:1], is_story) == payload["links"][0]
+    assert scraper.LoLChampionScraper._pick_link([], is_story) == ""
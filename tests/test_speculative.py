@@ -0,0 +1,33 @@
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("transformers")
+
+import speculative
+from generation import build_tiny_tokenizer, build_tiny_gpt2, TINY_TOKENIZER_CORPUS
+
+
+@pytest.fixture(scope="module")
+def tiny_models():
+    tokenizer = build_tiny_tokenizer()
+    target = build_tiny_gpt2(tokenizer, n_layer=4, n_embd=128, seed=0).eval()
+    draft = build_tiny_gpt2(tokenizer, n_layer=1, n_embd=64, seed=1).eval()
+    input_ids = tokenizer(TINY_TOKENIZER_CORPUS[0], return_tensors="pt").input_ids
+    return target, draft, input_ids
+
+def test_speculative_sampling_matches_target_distribution(tiny_models):
+    target, draft, input_ids = tiny_models
+    check = speculative.check_distribution(target, draft, input_ids, samples=2000, seed=0)
+    assert check["passed"], check
+
+def test_check_distribution_catches_sampling_from_the_draft(tiny_models, monkeypatch):
+    target, draft, input_ids = tiny_models
+
+    def draft_only(target, draft, input_ids, max_new_tokens=100, num_draft_tokens=4, temperature=1.0,
+                   top_k=0, top_p=1.0, eos_token_id=None, generator=None):
+        seq = speculative.sample_plain(draft, input_ids, max_new_tokens, temperature, top_k, top_p, generator)
+        return seq, {}
+
+    monkeypatch.setattr(speculative, "speculative_generate", draft_only)
+    check = speculative.check_distribution(target, draft, input_ids, samples=1000, seed=0)
+    assert not check["passed"], check